@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""Benchmarks of the hot paths of the KNN and decision tree models on synthetic data.
+
+Every benchmark times a call several times after a warmup call and reports the latency percentiles, the throughput in
+samples per second and the peak memory allocated during one call. The results are saved as JSON with the revision and the
+environment they were measured in, and two result files can be compared to spot regressions:
+
+    python benchmarks.py --num-samples 20000 --out before.json
+    python benchmarks.py --num-samples 20000 --out after.json --compare before.json
+"""
+
+import argparse
+import importlib.metadata
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+
+import models
+from models import KNN, DecisionTree, euclidean, manhattan, cost_misclassification, cost_entropy, cost_gini_index
+
+def make_classification(num_samples, num_features, num_classes, class_balance=None, class_sep=1., seed=0):
+    ''' Gaussian blobs, one per class, whose centers are class_sep apart on average. class_balance gives the proportion of
+    every class, uniform by default. Returns x of shape [num_samples, num_features] and labels from 0 to num_classes - 1'''
+    if class_balance is None:
+        class_balance = np.full(num_classes, 1. / num_classes)
+    class_balance = np.asarray(class_balance, dtype=float)
+    if class_balance.shape != (num_classes,) or np.any(class_balance < 0) or class_balance.sum() == 0:
+        raise ValueError(f'class_balance must have {num_classes} non-negative proportions')
+    rng = np.random.default_rng(seed)
+    y = rng.choice(num_classes, size=num_samples, p=class_balance / class_balance.sum())
+    centers = rng.normal(scale=class_sep, size=(num_classes, num_features))
+    x = centers[y] + rng.normal(size=(num_samples, num_features))
+    return x, y
+
+def measure(fn, repeats=5, warmup=1):
+    ''' Latencies in seconds of repeats calls of fn after warmup calls, and the peak memory in bytes allocated by one call'''
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    #tracing the allocations slows the call down, so the peak memory is measured on a separate call
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return np.array(latencies), peak
+
+def _result(name, params, num_items, latencies, peak):
+    return {'benchmark': name, 'params': params, 'num_items': num_items, 'repeats': latencies.shape[0],
+            'mean_ms': latencies.mean() * 1e3, 'p50_ms': np.percentile(latencies, 50) * 1e3,
+            'p90_ms': np.percentile(latencies, 90) * 1e3, 'p99_ms': np.percentile(latencies, 99) * 1e3,
+            'throughput': num_items / np.median(latencies), 'peak_mb': peak / 2**20}
+
+_dist_fns = {'euclidean': euclidean, 'manhattan': manhattan}
+_cost_fns = {'misclassification': cost_misclassification, 'entropy': cost_entropy, 'gini_index': cost_gini_index}
+
+#every benchmark yields (name, params, number of samples processed per call, function to time)
+def knn_benchmarks(x, y, x_test, Ks=(1, 5, 25)):
+    for dist_name, dist_fn in _dist_fns.items():
+        yield 'knn_fit', {'dist_fn': dist_name}, x.shape[0], lambda dist_fn=dist_fn: KNN(dist_fn=dist_fn).fit(x, y)
+        for K in Ks:
+            model = KNN(K=K, dist_fn=dist_fn).fit(x, y)
+            yield 'knn_predict', {'dist_fn': dist_name, 'K': K}, x_test.shape[0], lambda model=model: model.predict(x_test)
+
+def tree_benchmarks(x, y, x_test, depths=(3, 6, 12)):
+    data_indices = np.arange(x.shape[0])
+    num_classes = np.max(y) + 1
+    for cost_name, cost_fn in _cost_fns.items():
+        yield ('greedy_test', {'cost_fn': cost_name}, x.shape[0],
+               lambda cost_fn=cost_fn: models.greedy_test(x, y, data_indices, cost_fn, num_classes))
+        for depth in depths:
+            yield ('tree_fit', {'cost_fn': cost_name, 'max_depth': depth}, x.shape[0],
+                   lambda cost_fn=cost_fn, depth=depth: DecisionTree(max_depth=depth, cost_fn=cost_fn).fit(x, y))
+    for depth in depths:
+        tree = DecisionTree(max_depth=depth).fit(x, y)
+        yield 'tree_predict', {'max_depth': depth}, x_test.shape[0], lambda tree=tree: tree.predict(x_test)
+
+#the engines behind the K and max_depth sweeps of the experiments, and the approximate KNN sweep
+def sweep_benchmarks(x, y, x_test, K_max=30, max_depth=20):
+    knn = KNN(K=K_max).fit(x, y)
+    yield 'knn_predict_all_K', {'K_max': K_max}, x_test.shape[0], lambda: knn.predict_all_K(x_test)
+    tree = DecisionTree(max_depth=max_depth).fit(x, y)
+    depths = range(1, max_depth + 1)
+    yield 'tree_predict_depths', {'max_depth': max_depth}, x_test.shape[0], lambda: tree.predict_depths(x_test, depths)
+    yield ('sweep_approximate_knn', {'num_trees': [1, 5], 'num_probes': [1, 2]}, x_test.shape[0],
+           lambda: models.sweep_approximate_knn(x, y, x_test, num_trees_values=(1, 5), num_probes_values=(1, 2), seed=0))
+
+_suites = {'knn': knn_benchmarks, 'tree': tree_benchmarks, 'sweep': sweep_benchmarks}
+
+def run_benchmarks(num_samples=10000, num_features=8, num_classes=3, class_balance=None, num_test=2000, suites=tuple(_suites),
+                   repeats=5, seed=0, verbose=True):
+    ''' Runs the benchmarks of the given suites on synthetic data, returns the environment and the results as a dict'''
+    x, y = make_classification(num_samples + num_test, num_features, num_classes, class_balance, seed=seed)
+    x_test, x, y = x[num_samples:], x[:num_samples], y[:num_samples]
+    results = []
+    for suite in suites:
+        if suite not in _suites:
+            raise ValueError(f'unknown suite {suite!r}, expected one of {list(_suites)}')
+        for name, params, num_items, fn in _suites[suite](x, y, x_test):
+            latencies, peak = measure(fn, repeats)
+            results.append(_result(name, params, num_items, latencies, peak))
+            if verbose:
+                print(f"{name:24s} {json.dumps(params):45s} p50 {results[-1]['p50_ms']:10.2f} ms "
+                      f"{results[-1]['throughput']:12.0f} samples/s {results[-1]['peak_mb']:9.1f} MB")
+    return {'environment': environment(), 'data': {'num_samples': num_samples, 'num_features': num_features,
+            'num_classes': num_classes, 'class_balance': None if class_balance is None else list(class_balance),
+            'num_test': num_test, 'seed': seed}, 'results': results}
+
+def environment():
+    ''' Revision and versions the benchmarks ran with'''
+    try:
+        revision = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                                  cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {'revision': revision, 'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+            'numpy': np.__version__, 'numba': importlib.metadata.version('numba') if models.numba_available else None,
+            'backend': models._backend, 'platform': platform.platform(), 'cpu_count': os.cpu_count()}
+
+def compare(old, new):
+    ''' Ratio of the new to the old median latency of every benchmark found in both result dicts'''
+    key = lambda result: (result['benchmark'], json.dumps(result['params'], sort_keys=True))
+    old_results = {key(result): result for result in old['results']}
+    ratios = {}
+    for result in new['results']:
+        if key(result) in old_results:
+            ratios[key(result)] = result['p50_ms'] / old_results[key(result)]['p50_ms']
+    return ratios
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--num-samples', type=int, default=10000)
+    parser.add_argument('--num-features', type=int, default=8)
+    parser.add_argument('--num-classes', type=int, default=3)
+    parser.add_argument('--class-balance', type=lambda text: [float(p) for p in text.split(',')], default=None,
+                        help='comma separated class proportions, uniform by default')
+    parser.add_argument('--num-test', type=int, default=2000)
+    parser.add_argument('--suites', nargs='+', default=list(_suites), choices=list(_suites))
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--backend', choices=('numpy', 'numba'), default=None)
+    parser.add_argument('--out', default=None, help='JSON file to save the results to')
+    parser.add_argument('--compare', default=None, help='JSON file of earlier results to compare with')
+    args = parser.parse_args(args)
+    if args.backend is not None:
+        models.set_backend(args.backend)
+    report = run_benchmarks(args.num_samples, args.num_features, args.num_classes, args.class_balance, args.num_test,
+                            args.suites, args.repeats, args.seed)
+    if args.out is not None:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=1)
+    if args.compare is not None:
+        with open(args.compare) as f:
+            old = json.load(f)
+        for (name, params), ratio in compare(old, report).items():
+            print(f'{name:24s} {params:45s} {ratio:6.2f}x' + ('  slower' if ratio > 1.1 else ''))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1 @@
+# the modules live at the root of the repository, pytest puts this directory on sys.path for the tests
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""Compiled kernels of the inner loops of models.py.
+
+This module imports numba and is only imported by models.py the first time the numba backend runs a kernel, so importing
+the models does not load numba. The kernels give the same results as the numpy code they replace.
+"""
+
+import numba
+import numpy as np
+
+#K nearest of every row in increasing distance with ties broken by the lower index, like models._select_k_nearest. Every row
+#keeps a sorted list of its K nearest so far, a sample tied with the K-th nearest comes later and is not kept
+def select_rows(distances, K):
+    num_test, num_train = distances.shape
+    K = min(K, num_train)
+    knns = np.empty((num_test, K), dtype=np.int64)
+    for i in numba.prange(num_test):
+        best = np.empty(K)
+        count = 0
+        for j in range(num_train):
+            dist = distances[i, j]
+            if count == K and not dist < best[K - 1]:
+                continue
+            pos = min(count, K - 1)
+            while pos > 0 and best[pos - 1] > dist:
+                best[pos] = best[pos - 1]
+                knns[i, pos] = knns[i, pos - 1]
+                pos -= 1
+            best[pos] = dist
+            knns[i, pos] = j
+            count = min(count + 1, K)
+    return knns
+
+#manhattan distances accumulated over the features in the same order as models._accumulate_distances
+def manhattan_rows(x_train, x_test):
+    distances = np.zeros((x_test.shape[0], x_train.shape[0]))
+    for i in numba.prange(x_test.shape[0]):
+        for j in range(x_train.shape[0]):
+            dist = 0.
+            for f in range(x_train.shape[1]):
+                dist += abs(x_train[j, f] - x_test[i, f])
+            distances[i, j] = dist
+    return distances
+
+#leaf reached by every test sample, like models.FlatTree.apply
+def apply_rows(data_test, feature, threshold, left, right):
+    nodes = np.zeros(data_test.shape[0], dtype=np.int64)
+    for i in numba.prange(data_test.shape[0]):
+        node = 0
+        while left[node] >= 0:
+            node = left[node] if data_test[i, feature[node]] <= threshold[node] else right[node]
+        nodes[i] = node
+    return nodes
+
+#cost of a child from its class counts, with the same operations as counts_misclassification (0), counts_entropy (1)
+#and counts_gini_index (2)
+@numba.njit(nogil=True, cache=True)
+def counts_cost(counts, num_samples, cost_code):
+    total = 0.
+    for c in range(counts.shape[0]):
+        prob = counts[c] / num_samples
+        if cost_code == 0:
+            total = max(total, prob)
+        elif cost_code == 1:
+            total += prob * np.log(prob) if prob > 0 else 0.
+        else:
+            total += prob * prob
+    return -total if cost_code == 1 else 1 - total
+
+#single scan over the sorted values of a feature with the class counts on the left updated sample by sample, the
+#candidates and the lowest cost split are the same as in models.best_threshold. The features are searched in parallel by
+#the thread pools of the tree so the scan itself is serial
+@numba.njit(nogil=True, cache=True)
+def best_threshold(values, labels, num_classes, cost_code, num_instances):
+    num_samples = values.shape[0]
+    total = np.zeros(num_classes, dtype=np.int64)
+    for i in range(num_samples):
+        total[labels[i]] += 1
+    left = np.zeros(num_classes, dtype=np.int64)
+    best_cost, best_test = np.inf, 0.
+    num_left, previous = 0, -1
+    for j in range(num_samples - 1):
+        test = (values[j] + values[j + 1]) / 2.
+        while num_left < num_samples and values[num_left] <= test:
+            left[labels[num_left]] += 1
+            num_left += 1
+        valid = 0 < num_left < num_samples and num_left != previous
+        previous = num_left
+        if not valid:
+            continue
+        num_right = num_samples - num_left
+        cost = (num_left * counts_cost(left, num_left, cost_code)
+                + num_right * counts_cost(total - left, num_right, cost_code)) / num_instances
+        if cost < best_cost:
+            best_cost, best_test = cost, test
+    return best_cost, best_test
@@ -0,0 +1,1599 @@
+# -*- coding: utf-8 -*-
+"""KNN and decision tree models of the mini project.
+
+The models, their distance and cost functions, the feature store, the model files, the experiment runner and the
+cross-validation engine, importable without loading the datasets or running the experiments of mini_project1_knn.py.
+Importing the models only loads numpy: numba is imported by the first compiled kernel that runs, pandas by the
+functions returning tables and multiprocessing by the experiment runner.
+"""
+
+import contextlib
+import copy
+import heapq
+import importlib.util
+import json
+import os
+import threading
+import time
+import types
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+
+# Compiled kernels
+#
+# When numba is installed, the inner loops of the models run as compiled kernels: the selection of the K nearest
+# neighbours and the manhattan distances of every test sample, the scan of the split candidates of a feature and the
+# descent of every test sample down a fitted tree. They release the GIL and loop over the test samples in parallel.
+# Without numba, or after set_backend('numpy'), the numpy code below is used and both backends give the same results,
+# which check_backends verifies. The kernels live in kernels.py, which imports numba and is only imported the first
+# time a kernel runs, so importing the models only loads numpy.
+
+#whether numba is installed, the compiled kernels are then used by default
+numba_available = importlib.util.find_spec('numba') is not None
+_backend = 'numba' if numba_available else 'numpy'
+
+def set_backend(name):
+    ''' Selects the numpy code ('numpy') or the compiled kernels ('numba') for the inner loops of the models'''
+    global _backend
+    if name not in ('numpy', 'numba'):
+        raise ValueError(f"unknown backend {name!r}, expected 'numpy' or 'numba'")
+    if name == 'numba' and not numba_available:
+        raise ValueError('the numba backend needs numba to be installed')
+    _backend = name
+
+#the default numba threading layer does not allow two parallel loops at once, so the parallel version of a kernel is only run
+#from the main thread and the threads of the thread pools, which already run in parallel, run the serial version. The worker
+#processes of run_experiments also run the serial version so that they do not each start a pool of threads
+_parallel_kernels = True
+
+#the kernels are cached in __pycache__ next to kernels.py, so only the first process compiles them. The cache is keyed by the
+#function and not by the options it is compiled with, so the serial version is compiled from a copy of the kernel under its
+#own name and does not load the parallel version
+def _compile(kernel):
+    import numba
+    parallel = numba.njit(nogil=True, parallel=True, cache=True)(kernel)
+    serial_kernel = types.FunctionType(kernel.__code__, kernel.__globals__, kernel.__name__ + '_serial')
+    serial_kernel.__qualname__ = kernel.__qualname__ + '_serial'
+    serial = numba.njit(nogil=True, cache=True)(serial_kernel)
+    def run(*args):
+        if _parallel_kernels and threading.current_thread() is threading.main_thread():
+            return parallel(*args)
+        return serial(*args)
+    return run
+
+_jit = None
+_jit_lock = threading.Lock()
+
+#the compiled kernels by name, kernels.py is imported and the kernels are wrapped on the first call
+def _kernels():
+    global _jit
+    if _jit is None:
+        with _jit_lock:
+            if _jit is None:
+                import kernels
+                _jit = {'select_k_nearest': _compile(kernels.select_rows), 'manhattan': _compile(kernels.manhattan_rows),
+                        'apply': _compile(kernels.apply_rows), 'best_threshold': kernels.best_threshold}
+    return _jit
+
+#fits and predicts the same models with both backends on random data with many ties, and returns for every kernel whether
+#the two backends agree
+def check_backends(num_samples=2000, num_features=4, num_classes=3, seed=0):
+    if not numba_available:
+        raise ValueError('the numba backend needs numba to be installed')
+    rng = np.random.default_rng(seed)
+    x = rng.integers(0, 8, (num_samples, num_features))
+    y = rng.integers(0, num_classes, num_samples)
+    x_test = rng.integers(0, 8, (num_samples // 2, num_features)).astype(float)
+    distances = rng.integers(0, 20, (num_samples // 10, num_samples // 4)).astype(float)
+    results = {}
+    previous = _backend
+    try:
+        for backend in ('numpy', 'numba'):
+            set_backend(backend)
+            outputs = results[backend] = {}
+            outputs['select_k_nearest'] = _select_k_nearest(distances, 7)
+            outputs['manhattan'] = KNN(K=7, dist_fn=manhattan).fit(x, y).predict(x_test)[1]
+            for cost_fn in _counts_cost_fns:
+                tree = DecisionTree(max_depth=8, cost_fn=cost_fn).fit(x, y)
+                outputs[f'fit {cost_fn.__name__}'] = np.concatenate((tree.flat_tree.feature, tree.flat_tree.threshold))
+                outputs[f'predict {cost_fn.__name__}'] = tree.predict(x_test)
+    finally:
+        set_backend(previous)
+    return {name: np.array_equal(results['numpy'][name], results['numba'][name]) for name in results['numpy']}
+
+# Profiling
+#
+# A Profiler given to a model with stats=profiler records where the model spends its time: timed spans of the distance
+# blocks and neighbour selections of KNN, of the node splits of the decision tree and of the traversals of predict, and
+# counters of the distance evaluations, nodes and traversal steps. Without a profiler the models only check that stats
+# is None once per block or node. The spans can be summarized, written as JSON lines or as a Chrome trace
+# (chrome://tracing or https://ui.perfetto.dev).
+
+class Profiler:
+    def __init__(self, callback=None):
+        self.callback = callback    #called with every span as it ends, for example to forward it to a logger
+        self.origin = time.perf_counter()
+        self.spans = []             #name, start and duration in seconds since the profiler was created, thread and arguments
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def count(self, name, value=1):
+        ''' Adds value to the counter name'''
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextlib.contextmanager
+    def span(self, name, **args):
+        ''' Times the block under name, the block can add arguments to the dict it receives'''
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            span = {'name': name, 'start': start - self.origin, 'duration': time.perf_counter() - start,
+                    'thread': threading.get_ident(), 'args': args}
+            self.spans.append(span)
+            if self.callback is not None:
+                self.callback(span)
+
+    def summary(self, by=None):
+        ''' Number of calls, total and mean time of every span name, and of every value of the argument by when it is given
+        (for example by='depth' for the time per depth level of the tree)'''
+        rows = [{'name': span['name'], by: span['args'].get(by), 'duration': span['duration']} if by is not None else
+                {'name': span['name'], 'duration': span['duration']} for span in self.spans]
+        keys = ['name'] if by is None else ['name', by]
+        import pandas as pd
+        summary = pd.DataFrame(rows, columns=keys + ['duration']).groupby(keys, dropna=False)['duration']
+        return summary.agg(calls='count', total_s='sum', mean_s='mean').reset_index()
+
+    def to_log(self, path):
+        ''' Writes every span and then the counters as JSON lines'''
+        with open(path, 'w') as f:
+            for span in self.spans:
+                f.write(json.dumps(span, default=_to_json) + '\n')
+            f.write(json.dumps({'counters': self.counters}, default=_to_json) + '\n')
+
+    def to_chrome_trace(self, path):
+        ''' Writes the spans as complete events and the final counter values in the Chrome trace event format'''
+        pid = os.getpid()
+        events = [{'name': span['name'], 'ph': 'X', 'ts': span['start'] * 1e6, 'dur': span['duration'] * 1e6, 'pid': pid,
+                   'tid': span['thread'], 'args': span['args']} for span in self.spans]
+        end = max((span['start'] + span['duration'] for span in self.spans), default=0.)
+        events += [{'name': name, 'ph': 'C', 'ts': end * 1e6, 'pid': pid, 'args': {'value': value}}
+                   for name, value in self.counters.items()]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, default=_to_json)
+
+#numpy scalars in the span arguments
+def _to_json(value):
+    return value.item() if isinstance(value, np.generic) else str(value)
+
+#span of a model's profiler, or a no-op when it has none
+_no_span = contextlib.nullcontext()
+
+def _span(stats, name, **args):
+    return _no_span if stats is None else stats.span(name, **args)
+
+# K-Nearest Neighbour
+
+# KNN
+#the distance functions are defined with def so that models configured with them can be pickled to the worker
+#processes of run_experiments
+def euclidean(x1, x2):
+    return np.sqrt(np.sum((x1 - x2)**2, axis=-1))
+
+def manhattan(x1, x2):
+    return np.sum(np.abs(x1 - x2), axis=-1)
+
+#accumulates op(x_train - x_test) one feature at a time into an array of shape [num_test, num_train], so that
+#the [num_test, num_train, D] difference tensor built by the distance functions above is never materialized
+def _accumulate_distances(x_train, x_test, op):
+    distances = np.zeros((x_test.shape[0], x_train.shape[0]))
+    diff = np.empty_like(distances)
+    for d in range(x_train.shape[1]):
+        np.subtract(x_train[None,:,d], x_test[:,None,d], out=diff)
+        distances += op(diff, out=diff)
+    return distances
+
+#squared euclidean distances from ||a - b||^2 = ||a||^2 + ||b||^2 - 2ab, the cross term is a single matrix product (BLAS)
+#and the squared norms of the training samples are computed once in KNN.fit
+def _squared_euclidean_gemm(x_train, x_test, train_sq_norms):
+    distances = x_test @ x_train.T
+    distances *= -2
+    distances += train_sq_norms[None,:]
+    distances += np.einsum('ij,ij->i', x_test, x_test)[:,None]
+    #rounding can make the distance of (nearly) identical samples slightly negative
+    np.maximum(distances, 0, out=distances)
+    return distances
+
+#indices of the K smallest distances in every row of distances, in increasing distance with ties broken by the lower training index.
+#A partial selection finds the K survivors of every row at once and only those are sorted
+def _select_k_nearest(distances, K):
+    if _backend == 'numba':
+        return _kernels()['select_k_nearest'](distances, K)
+    num_test, num_train = distances.shape
+    rows = np.arange(num_test)[:,None]
+    if K < num_train:
+        knns = np.argpartition(distances, K - 1, axis=1)[:,:K]
+        #the partition keeps an arbitrary subset of the samples tied at the K-th distance, the rows with more tied samples
+        #than free slots keep every sample below the K-th distance and the tied samples with the lowest training indices,
+        #the first ones along the row whose running count of tied samples fits in the free slots
+        kth = np.max(distances[rows, knns], axis=1, keepdims=True)
+        below = distances < kth
+        tied = distances == kth
+        fix = np.flatnonzero(np.sum(below, axis=1) + np.sum(tied, axis=1) > K)
+        if fix.shape[0] > 0:
+            tied_fix = tied[fix]
+            free = K - np.sum(below[fix], axis=1, keepdims=True)
+            keep = np.cumsum(tied_fix, axis=1) <= free
+            keep &= tied_fix
+            keep |= below[fix]
+            #every row keeps exactly K samples, nonzero lists them row by row
+            knns[fix] = np.nonzero(keep)[1].reshape(fix.shape[0], K)
+    else:
+        knns = np.tile(np.arange(num_train), (num_test, 1))
+    #sort the survivors by index, then stably by distance
+    knns.sort(axis=1)
+    order = np.argsort(distances[rows, knns], axis=1, kind='stable')
+    return knns[rows, order]
+
+#probability distribution over C classes of every test sample from the labels of its nearest neighbours, shape [num_test, K].
+#The number of instances of each class of all test samples are counted with a single scatter-add over flattened (row, class) bins
+def _knn_vote(neighbour_labels, C, out=None):
+    num_test, K = neighbour_labels.shape
+    votes = neighbour_labels + C * np.arange(num_test)[:,None]
+    counts = np.bincount(votes.ravel(), minlength=num_test * C).reshape(num_test, C)
+    #y_prob /= np.sum(y_prob, axis=-1, keepdims=True)
+    #simply divide by K to get a probability distribution, written to out when it is given
+    return np.divide(counts, K, out=out)
+
+#buffer with room for num_rows rows, reused when it is big enough and reallocated otherwise
+def _grow_buffer(buffer, num_rows, width, dtype):
+    if buffer is None or buffer.shape[0] < num_rows:
+        buffer = np.empty((num_rows, width), dtype=dtype)
+    return buffer
+
+#distance functions with a blockwise kernel, any other dist_fn is called on bounded blocks of the test set
+_block_distance_fns = (euclidean, manhattan)
+
+#distances used to rank neighbours inside the spatial indexes: squared euclidean distances (same ranking, no sqrt) and manhattan distances
+def _rank_distances(points, q, dist_fn):
+    if dist_fn is euclidean:
+        return np.sum((points - q)**2, axis=-1)
+    return np.sum(np.abs(points - q), axis=-1)
+
+class _SpatialTree:
+    ''' Binary space partitioning of the training samples stored in flat arrays, node i covers the training samples
+    indices[start[i]:end[i]] and its children are left[i] and right[i] (-1 for leaves)'''
+
+    def __init__(self, x, dist_fn, leaf_size=20):
+        if dist_fn not in _block_distance_fns:
+            raise ValueError('spatial indexes only support the euclidean and manhattan distance functions')
+        self.x = np.asarray(x, dtype=float)
+        self.dist_fn = dist_fn
+        self.leaf_size = leaf_size
+        self.indices = np.arange(self.x.shape[0])
+        self.start, self.end, self.left, self.right = [], [], [], []
+        self._init_bounds()
+        self._build(0, self.x.shape[0])
+        self.start, self.end = np.array(self.start), np.array(self.end)
+        self.left, self.right = np.array(self.left), np.array(self.right)
+        self._finish_bounds()
+
+    def _build(self, start, end):
+        node = len(self.start)
+        points = self.x[self.indices[start:end]]
+        self.start.append(start)
+        self.end.append(end)
+        self.left.append(-1)
+        self.right.append(-1)
+        self._add_bounds(points)
+        if end - start <= self.leaf_size:
+            return node
+        #split at the median of the feature with the largest spread
+        f = np.argmax(np.max(points, axis=0) - np.min(points, axis=0))
+        mid = (start + end) // 2
+        order = np.argpartition(points[:,f], mid - start)
+        self.indices[start:end] = self.indices[start:end][order]
+        self.left[node] = self._build(start, mid)
+        self.right[node] = self._build(mid, end)
+        return node
+
+    def query(self, q, K, stats=None):
+        ''' Indices of the K nearest training samples of q in increasing distance, ties broken by the lower training index.
+        The number of training samples compared to q is added to the knn.distance_evaluations counter of stats'''
+        best_dist = np.full(K, np.inf)
+        best_ind = np.full(K, -1)
+        num_evaluations = 0
+        #depth first search visiting the closest child first, a node is skipped when its lower bound is
+        #strictly larger than the current K-th distance so samples tied with it are still considered
+        stack = [(0, 0.)]
+        while stack:
+            node, bound = stack.pop()
+            if bound > best_dist[-1]:
+                continue
+            left, right = self.left[node], self.right[node]
+            if left < 0:
+                candidates = self.indices[self.start[node]:self.end[node]]
+                num_evaluations += candidates.shape[0]
+                dist = np.concatenate((best_dist, _rank_distances(self.x[candidates], q, self.dist_fn)))
+                ind = np.concatenate((best_ind, candidates))
+                keep = np.lexsort((ind, dist))[:K]
+                best_dist, best_ind = dist[keep], ind[keep]
+                continue
+            left_bound, right_bound = self._lower_bound(left, q), self._lower_bound(right, q)
+            if left_bound <= right_bound:
+                stack.extend(((right, right_bound), (left, left_bound)))
+            else:
+                stack.extend(((left, left_bound), (right, right_bound)))
+        if stats is not None:
+            stats.count('knn.distance_evaluations', num_evaluations)
+        return best_ind
+
+class KDTree(_SpatialTree):
+    ''' KD-tree whose nodes store the bounding box of their samples, suited to a small number of features'''
+
+    def _init_bounds(self):
+        self.lower, self.upper = [], []
+
+    def _add_bounds(self, points):
+        self.lower.append(np.min(points, axis=0))
+        self.upper.append(np.max(points, axis=0))
+
+    def _finish_bounds(self):
+        self.lower, self.upper = np.array(self.lower), np.array(self.upper)
+
+    def _lower_bound(self, node, q):
+        #distance from q to the closest point of the bounding box
+        gap = np.maximum(np.maximum(self.lower[node] - q, q - self.upper[node]), 0)
+        return _rank_distances(gap, 0, self.dist_fn)
+
+class BallTree(_SpatialTree):
+    ''' Ball-tree whose nodes store the centroid of their samples and the radius of the ball containing them'''
+
+    def _init_bounds(self):
+        self.center, self.radius = [], []
+
+    def _add_bounds(self, points):
+        center = np.mean(points, axis=0)
+        self.center.append(center)
+        self.radius.append(np.max(self._distances(points, center)))
+
+    def _finish_bounds(self):
+        self.center, self.radius = np.array(self.center), np.array(self.radius)
+
+    def _distances(self, points, q):
+        distances = _rank_distances(points, q, self.dist_fn)
+        return np.sqrt(distances) if self.dist_fn is euclidean else distances
+
+    def _lower_bound(self, node, q):
+        #triangle inequality, shrunk by a relative tolerance so that rounding never prunes a ball holding a neighbour
+        bound = max(self._distances(self.center[node], q) - self.radius[node], 0) * (1 - 1e-9)
+        return bound**2 if self.dist_fn is euclidean else bound
+
+class RandomProjectionForest:
+    ''' Approximate nearest neighbour index made of num_trees random projection trees. Every node splits its samples at the
+    median of their projection on a random direction, gaussian for the euclidean distance and cauchy (1-stable, so projections
+    preserve manhattan distances in distribution) for the manhattan distance. A query collects the samples of the num_probes
+    most promising leaves of every tree and ranks them with the exact distance, more trees and probes trade latency for recall.
+    The directions are drawn from a generator of its own seeded with seed, the global numpy generator is left untouched'''
+
+    def __init__(self, x, dist_fn, leaf_size=20, num_trees=10, num_probes=1, seed=None):
+        if dist_fn not in _block_distance_fns:
+            raise ValueError('random projection forests only support the euclidean and manhattan distance functions')
+        self.x = np.asarray(x, dtype=float)
+        self.dist_fn = dist_fn
+        self.leaf_size = leaf_size
+        self.num_trees = num_trees
+        self.num_probes = num_probes
+        self.rng = np.random.default_rng(seed)
+        num_train = self.x.shape[0]
+        #the trees share flat node arrays, tree t has its root at roots[t] and its permutation of the training samples
+        #at indices[t * num_train:(t + 1) * num_train]
+        self.indices = np.tile(np.arange(num_train), num_trees)
+        self.direction, self.threshold, self.start, self.end, self.left, self.right = [], [], [], [], [], []
+        self.roots = np.array([self._build(t * num_train, (t + 1) * num_train) for t in range(num_trees)])
+        self.direction, self.threshold = np.array(self.direction), np.array(self.threshold)
+        self.start, self.end = np.array(self.start), np.array(self.end)
+        self.left, self.right = np.array(self.left), np.array(self.right)
+
+    def _random_direction(self):
+        num_features = self.x.shape[1]
+        if self.dist_fn is euclidean:
+            return self.rng.standard_normal(num_features)
+        return self.rng.standard_cauchy(num_features)
+
+    def _build(self, start, end):
+        node = len(self.start)
+        self.start.append(start)
+        self.end.append(end)
+        self.left.append(-1)
+        self.right.append(-1)
+        self.direction.append(np.zeros(self.x.shape[1]))
+        self.threshold.append(0.)
+        if end - start <= self.leaf_size:
+            return node
+        direction = self._random_direction()
+        projections = self.x[self.indices[start:end]] @ direction
+        mid = (end - start) // 2
+        order = np.argpartition(projections, mid)
+        self.indices[start:end] = self.indices[start:end][order]
+        projections = projections[order]
+        self.direction[node] = direction
+        self.threshold[node] = (np.max(projections[:mid]) + projections[mid]) / 2
+        self.left[node] = self._build(start, start + mid)
+        self.right[node] = self._build(start + mid, end)
+        return node
+
+    def _probe(self, root, q):
+        ''' Training samples of the num_probes leaves of a tree whose splits q is the furthest from'''
+        #best-first search where the priority of a branch is the largest margin by which q lies on the other side of a split
+        heap = [(0., root)]
+        leaves = []
+        while heap and len(leaves) < self.num_probes:
+            priority, node = heapq.heappop(heap)
+            while self.left[node] >= 0:
+                margin = q @ self.direction[node] - self.threshold[node]
+                near, far = (self.left[node], self.right[node]) if margin <= 0 else (self.right[node], self.left[node])
+                heapq.heappush(heap, (max(priority, abs(margin)), far))
+                node = near
+            leaves.append(self.indices[self.start[node]:self.end[node]])
+        return leaves
+
+    def query(self, q, K, stats=None):
+        ''' Indices of (approximately) the K nearest training samples of q in increasing distance, ties broken by the lower training index.
+        The number of candidates compared to q is added to the knn.distance_evaluations counter of stats'''
+        candidates = np.unique(np.concatenate([leaf for root in self.roots for leaf in self._probe(root, q)]))
+        if candidates.shape[0] < K:
+            #too few samples in the probed leaves, fall back to the whole training set
+            candidates = np.arange(self.x.shape[0])
+        dist = _rank_distances(self.x[candidates], q, self.dist_fn)
+        if stats is not None:
+            stats.count('knn.distance_evaluations', candidates.shape[0])
+        #candidates are sorted by index, the stable sort keeps the lower index first among equal distances
+        return candidates[np.argsort(dist, kind='stable')[:K]]
+
+_spatial_indexes = {'kd_tree': KDTree, 'ball_tree': BallTree, 'rp_forest': RandomProjectionForest}
+
+class KNN:
+
+    def __init__(self, K=1, dist_fn= euclidean, memory_budget=None, index=None, leaf_size=20, num_trees=10, num_probes=1,
+                 train_block_size=None, n_jobs=None, stats=None, seed=None):
+        self.dist_fn = dist_fn
+        self.K = K
+        self.memory_budget = memory_budget  #maximum number of bytes for the distances of the blocks of test samples processed at once, None processes the whole test set at once
+        self.index = index                  #None for brute-force search, 'kd_tree' or 'ball_tree' to build an exact spatial index in fit,
+                                            #'rp_forest' for approximate search in a random projection forest
+        self.leaf_size = leaf_size          #maximum number of training samples in a leaf of the spatial index
+        self.num_trees = num_trees          #number of trees of the random projection forest
+        self.num_probes = num_probes        #number of leaves visited per tree of the random projection forest in predict
+        self.train_block_size = train_block_size    #number of training samples whose distances are computed at once, None streams
+                                                    #memory-mapped training sets by blocks of 2**16 and keeps the others whole
+        self.n_jobs = n_jobs                #number of threads of the brute-force search, None searches in the calling thread.
+                                            #The blocks its threads hold at the same time share the memory budget
+        self.stats = stats                  #optional Profiler recording the distance and selection times
+        self.seed = seed                    #seed of the random directions of the random projection forest, None draws fresh ones
+        if n_jobs is not None and n_jobs < 1:
+            raise ValueError(f'n_jobs must be None or at least 1, got {n_jobs}')
+        if index is not None and index not in _spatial_indexes:
+            raise ValueError(f'unknown index {index!r}, expected one of {list(_spatial_indexes)}')
+        return
+
+    def fit(self, x, y):
+        ''' Store the training data using this method as it is a lazy learner'''
+        self.x = x
+        self.y = y
+        self.C = int(np.max(y)) + 1
+        if self.dist_fn is euclidean:
+            #the matrix product runs on floats, the squared norms of the training samples are reused by every predict
+            if self._train_blocks() is None:
+                self.x_float = np.asarray(x, dtype=float)
+                self.x_sq_norms = np.einsum('ij,ij->i', self.x_float, self.x_float)
+            else:
+                #a streamed training set is never converted whole, its blocks are converted when they are read
+                self.x_float = None
+                self.x_sq_norms = np.empty(x.shape[0])
+                for rows in self._train_blocks():
+                    x_block = np.asarray(x[rows], dtype=float)
+                    self.x_sq_norms[rows] = np.einsum('ij,ij->i', x_block, x_block)
+        if self.index == 'rp_forest':
+            self.index_tree = RandomProjectionForest(x, self.dist_fn, self.leaf_size, self.num_trees, self.num_probes, self.seed)
+        elif self.index is not None:
+            self.index_tree = _spatial_indexes[self.index](x, self.dist_fn, self.leaf_size)
+        return self
+
+    def _train_blocks(self):
+        ''' Slices of the training samples whose distances are computed at once, or None when the training set is not streamed'''
+        block_size = self.train_block_size
+        if block_size is None and isinstance(self.x, np.memmap):
+            block_size = 2**16
+        if block_size is None:
+            return None
+        return [slice(start, min(start + block_size, self.x.shape[0])) for start in range(0, self.x.shape[0], block_size)]
+
+    def _block_size(self, num_test, num_threads=1):
+        ''' Number of test samples whose distances to the training set fit in the memory budget, which is shared by the blocks
+        num_threads threads process at the same time'''
+        if self.memory_budget is None:
+            return max(num_test, 1)
+        num_train, num_features = self.x.shape
+        if self._train_blocks() is not None:
+            #only one block of training samples is compared to the test samples at a time
+            num_train = self._train_blocks()[0].stop
+        #the blockwise kernels keep the distances and one temporary of shape [block, num_train], other distance functions
+        #build the difference tensor of shape [block, num_train, D] and its square/abs. The selection of the nearest
+        #neighbours adds the index array of the partial sort and two boolean masks of shape [block, num_train], and the rows
+        #with ties to break at the K-th distance (all of them at worst) a running count of the tied samples and two more masks
+        if self.dist_fn in _block_distance_fns:
+            bytes_per_test = 2 * num_train * 8
+        else:
+            bytes_per_test = 2 * num_train * num_features * 8
+        bytes_per_test += num_train * (8 + 2) + num_train * (8 + 2)
+        return max(1, int(self.memory_budget // num_threads // bytes_per_test))
+
+    def _distances(self, x_test, squared=False, rows=slice(None)):
+        ''' Distances between the given test samples and the training samples in rows (all of them by default) as an array of
+        shape [num_test, num_rows]. With squared=True euclidean distances are not square rooted, which is enough when only their
+        ranking is needed'''
+        if self.stats is not None:
+            with self.stats.span('knn.distances', num_test=x_test.shape[0]):
+                distances = self._compute_distances(x_test, squared, rows)
+            self.stats.count('knn.distance_evaluations', distances.size)
+            return distances
+        return self._compute_distances(x_test, squared, rows)
+
+    def _compute_distances(self, x_test, squared, rows):
+        if self.dist_fn is euclidean:
+            x_train = self.x_float[rows] if self.x_float is not None else np.asarray(self.x[rows], dtype=float)
+            distances = _squared_euclidean_gemm(x_train, np.asarray(x_test, dtype=float), self.x_sq_norms[rows])
+            return distances if squared else np.sqrt(distances, out=distances)
+        if self.dist_fn is manhattan:
+            if _backend == 'numba':
+                return _kernels()['manhattan'](np.asarray(self.x[rows]), np.asarray(x_test))
+            return _accumulate_distances(self.x[rows], x_test, np.abs)
+        return self.dist_fn(self.x[rows][None,:,:], x_test[:,None,:])
+
+    def _streamed_knns(self, x_test, K):
+        ''' Exact K nearest neighbours of the test samples computed one block of training samples at a time'''
+        rows = np.arange(x_test.shape[0])[:,None]
+        best_dist = np.empty((x_test.shape[0], 0))
+        best_knns = np.empty((x_test.shape[0], 0), dtype=int)
+        for block in self._train_blocks():
+            distances = self._distances(x_test, squared=True, rows=block)
+            with _span(self.stats, 'knn.select', num_test=x_test.shape[0]):
+                knns = _select_k_nearest(distances, min(K, distances.shape[1]))
+            #the neighbours found so far come from earlier blocks and are sorted by distance then index, so a tie between
+            #candidates is still broken by the lower training index when the K nearest are selected again
+            dist = np.concatenate((best_dist, distances[rows, knns]), axis=1)
+            knns = np.concatenate((best_knns, knns + block.start), axis=1)
+            with _span(self.stats, 'knn.select', num_test=x_test.shape[0]):
+                survivors = _select_k_nearest(dist, min(K, dist.shape[1]))
+            best_dist, best_knns = dist[rows, survivors], knns[rows, survivors]
+        return best_knns
+
+    def _brute_force_knns(self, x_test, K, out=None):
+        ''' Exact K nearest neighbours of the test samples computed from their distances to every training sample'''
+        knns = np.zeros((x_test.shape[0], K), dtype=int) if out is None else out
+        #the test set is processed in blocks so that the distances never exceed the memory budget
+        block_size = self._block_size(x_test.shape[0])
+        num_threads = 1
+        if self.n_jobs is not None:
+            #without a memory budget the blocks have the same size whatever the number of threads
+            block_size = min(block_size, 1024)
+            num_threads = min(self.n_jobs, -(-x_test.shape[0] // block_size))
+            #the threads process their blocks at the same time, each of them gets its share of the memory budget
+            block_size = min(block_size, self._block_size(x_test.shape[0], num_threads))
+        blocks = [slice(start, min(start + block_size, x_test.shape[0])) for start in range(0, x_test.shape[0], block_size)]
+        if num_threads == 1:
+            for block in blocks:
+                self._knn_block(x_test[block], K, knns[block])
+        else:
+            #the distance kernels, matrix products and partial sorts release the GIL, every thread writes its own rows of knns
+            with ThreadPoolExecutor(num_threads) as pool:
+                list(pool.map(lambda block: self._knn_block(x_test[block], K, knns[block]), blocks))
+        return knns
+
+    def _knn_block(self, x_test, K, out):
+        if self._train_blocks() is not None:
+            out[:] = self._streamed_knns(x_test, K)
+            return
+        #calculate distance between the training & the block of test samples, an array of shape [num_test, num_train]
+        #only the ranking of the distances matters here so euclidean distances are left squared
+        distances = self._distances(x_test, squared=True)
+        with _span(self.stats, 'knn.select', num_test=x_test.shape[0]):
+            out[:] = _select_k_nearest(distances, K)
+
+    def _knns(self, x_test, K, out=None):
+        ''' K nearest neighbours of the test samples in increasing distance, from the spatial index if there is one. They are
+        written to out when it is given'''
+        if self.index is None:
+            return self._brute_force_knns(x_test, K, out)
+        #search in the spatial index, only the training samples of the visited nodes are compared to the test sample
+        if self.index == 'rp_forest':
+            self.index_tree.num_probes = self.num_probes    #the number of probes can be tuned without refitting
+        knns = np.zeros((x_test.shape[0], K), dtype=int) if out is None else out
+        with _span(self.stats, 'knn.index_query', num_test=x_test.shape[0]):
+            for i in range(x_test.shape[0]):
+                knns[i,:] = self.index_tree.query(x_test[i], K, self.stats)
+        return knns
+
+    def predict(self, x_test):
+        ''' Makes a prediction using the stored training data and the test data given as argument'''
+        #ith-row of knns stores the indices of k closest training samples to the ith-test sample
+        knns = self._knns(x_test, self.K)
+        #ith-row of y_prob has the probability distribution over C classes
+        y_prob = _knn_vote(self.y[knns], self.C)
+        return y_prob, knns
+
+    def predict_all_K(self, x_test, K_max=None):
+        ''' Makes the predictions of every K from 1 to K_max (self.K by default) with a single neighbour search. Returns y_probs of
+        shape [K_max, num_test, C] where y_probs[k - 1] is the y_prob predict returns with K=k, and the K_max nearest neighbours'''
+        K_max = self.K if K_max is None else K_max
+        knns = self._knns(x_test, K_max)
+        #the neighbours are sorted by distance so the votes of the k closest are the cumulative class counts up to column k
+        votes = np.cumsum(np.eye(self.C, dtype=np.int64)[self.y[knns]], axis=1)
+        y_probs = np.moveaxis(votes, 1, 0) / np.arange(1, K_max + 1)[:,None,None]
+        return y_probs, knns
+
+    def predict_iter(self, batches):
+        ''' Makes the predictions of an iterable of test batches, each of shape [batch_size, D], and yields (y_prob, knns) for
+        every batch as predict does. The outputs are views into buffers reused by the next batch, copy them to keep them'''
+        y_prob, knns = None, None
+        for x_test in batches:
+            x_test = np.asarray(x_test)
+            num_test = x_test.shape[0]
+            y_prob = _grow_buffer(y_prob, num_test, self.C, float)
+            knns = _grow_buffer(knns, num_test, self.K, int)
+            self._knns(x_test, self.K, out=knns[:num_test])
+            _knn_vote(self.y[knns[:num_test]], self.C, out=y_prob[:num_test])
+            yield y_prob[:num_test], knns[:num_test]
+
+    def classify_grid(self, x0v, x1v, cell_size=8):
+        ''' Predicted class of every point of the grid of the sorted values x0v of the first feature and x1v of the second one,
+        shape [len(x1v), len(x0v)]. The grid is cut into cells of cell_size x cell_size points, a cell whose corners and center
+        are predicted the same class is filled with it and any other cell is cut in four, down to single points, so only the
+        points near a class change are queried. A region of another class smaller than a cell that holds none of its corners
+        and center can be missed'''
+        if cell_size < 1 or cell_size & (cell_size - 1):
+            raise ValueError(f'cell_size must be a power of two, got {cell_size}')
+        num_rows, num_cols = len(x1v), len(x0v)
+        labels = np.full((num_rows, num_cols), -1, dtype=np.int64)
+        rows, cols = np.meshgrid(np.arange(0, num_rows, cell_size), np.arange(0, num_cols, cell_size), indexing='ij')
+        rows, cols, size = rows.ravel(), cols.ravel(), cell_size
+        while rows.shape[0] > 0:
+            #last row and column of every cell, the cells on the edges of the grid can be cut short
+            last_rows, last_cols = np.minimum(rows + size, num_rows) - 1, np.minimum(cols + size, num_cols) - 1
+            probe_rows = np.stack((rows, rows, last_rows, last_rows, (rows + last_rows) // 2))
+            probe_cols = np.stack((cols, last_cols, cols, last_cols, (cols + last_cols) // 2))
+            #only the points that were not predicted yet are queried
+            points = np.unique(probe_rows * num_cols + probe_cols)
+            points = points[labels.ravel()[points] < 0]
+            if points.shape[0] > 0:
+                y_prob, _ = self.predict(np.column_stack((np.asarray(x0v)[points % num_cols], np.asarray(x1v)[points // num_cols])))
+                labels.ravel()[points] = np.argmax(y_prob, axis=-1)
+            probes = labels[probe_rows, probe_cols]
+            uniform = np.all(probes == probes[0], axis=0)
+            for row, col, last_row, last_col, label in zip(rows[uniform], cols[uniform], last_rows[uniform], last_cols[uniform], probes[0, uniform]):
+                cell = labels[row:last_row + 1, col:last_col + 1]
+                cell[cell < 0] = label
+            if size == 1:
+                break
+            #the other cells are cut in four, dropping the quarters that fall outside the grid
+            size //= 2
+            rows, cols = rows[~uniform], cols[~uniform]
+            rows = np.concatenate((rows, rows, rows + size, rows + size))
+            cols = np.concatenate((cols, cols + size, cols, cols + size))
+            inside = (rows < num_rows) & (cols < num_cols)
+            rows, cols = rows[inside], cols[inside]
+        return labels
+
+    def recall_at_k(self, x_test):
+        ''' Fraction of the K nearest neighbours predict returns that are as close to their test sample as the exact K-th
+        nearest neighbour (brute-force search). A neighbour tied with the K-th nearest counts whatever its index'''
+        _, knns = self.predict(x_test)
+        exact = self._brute_force_knns(x_test, self.K)
+        #both distances are computed with dist_fn itself, so that a tie gives equal values
+        x_test = np.asarray(x_test)[:,None,:]
+        kth = np.max(self.dist_fn(self.x[exact], x_test), axis=1, keepdims=True)
+        hits = np.sum(self.dist_fn(self.x[knns], x_test) <= kth)
+        return hits / exact.size
+
+#measures the fit and predict time of brute-force and indexed KNN on uniform random data for every number of
+#training samples in Ns and number of features in Ds
+def benchmark_knn_index(Ns=(1000, 10000, 100000), Ds=(2, 4, 8), num_test=200, K=5, dist_fn=euclidean, indexes=(None, 'kd_tree', 'ball_tree')):
+    rng = np.random.default_rng(0)
+    rows = []
+    for D in Ds:
+        for N in Ns:
+            x, y = rng.random((N, D)), rng.integers(0, 2, N)
+            x_test = rng.random((num_test, D))
+            for index in indexes:
+                model = KNN(K=K, dist_fn=dist_fn, index=index)
+                start = time.perf_counter()
+                model.fit(x, y)
+                fitted = time.perf_counter()
+                model.predict(x_test)
+                predicted = time.perf_counter()
+                rows.append({'index': index or 'brute', 'N': N, 'D': D, 'fit_s': fitted - start,
+                             'query_ms': 1000 * (predicted - fitted) / num_test})
+    import pandas as pd
+    return pd.DataFrame(rows)
+
+#recall@K and time per query of the random projection forest for every combination of number of trees and probes,
+#used to pick an operating point on real data
+def sweep_approximate_knn(x_train, y_train, x_test, K=5, dist_fn=euclidean, num_trees_values=(1, 5, 10, 20), num_probes_values=(1, 2, 4), leaf_size=20,
+                          seed=None):
+    rows = []
+    for num_trees in num_trees_values:
+        model = KNN(K=K, dist_fn=dist_fn, index='rp_forest', leaf_size=leaf_size, num_trees=num_trees, seed=seed)
+        start = time.perf_counter()
+        model.fit(x_train, y_train)
+        fit_s = time.perf_counter() - start
+        for num_probes in num_probes_values:
+            model.num_probes = num_probes
+            start = time.perf_counter()
+            model.predict(x_test)
+            query_ms = 1000 * (time.perf_counter() - start) / x_test.shape[0]
+            rows.append({'num_trees': num_trees, 'num_probes': num_probes, 'fit_s': fit_s,
+                         'query_ms': query_ms, 'recall': model.recall_at_k(x_test)})
+    import pandas as pd
+    return pd.DataFrame(rows)
+
+# Decision Tree
+#
+# We first define the Node class that will be used in our binary tree. Nodes only keep the split and leaf information,
+# the training data and the index buffers are owned by the TreeBuilder while the tree is fitted.
+
+class Node:
+    __slots__ = ('left', 'right', 'split_feature', 'split_value', 'depth', 'class_prob')
+
+    def __init__(self, depth, class_prob):
+        self.left = None                                    #stores the left child of the node 
+        self.right = None                                   #stores the right child of the node
+        self.split_feature = None                           #the feature for split at this node
+        self.split_value = None                             #the value of the feature for split at this node
+        self.depth = depth                                  #the depth of the node, 0 for the root
+        self.class_prob = class_prob                        #stores the class probability for the node
+        #note that we'll use the class probabilites of the leaf nodes for making predictions after the tree is built
+
+# We define different cost functions that will be used to find the splits that yield the lowest cost.
+
+#computes misclassification cost by subtracting the maximum probability of any class
+def cost_misclassification(labels):
+    counts = np.bincount(labels) 
+    class_probs = counts / np.sum(counts)
+    #you could compress both the steps above by doing class_probs = np.bincount(labels) / len(labels)
+    return 1 - np.max(class_probs)
+
+#computes entropy of the labels by computing the class probabilities
+def cost_entropy(labels):
+    class_probs = np.bincount(labels) / len(labels)
+    class_probs = class_probs[class_probs > 0]              #this steps is remove 0 probabilities for removing numerical issues while computing log
+    return -np.sum(class_probs * np.log(class_probs))       #expression for entropy -\sigma p(x)log[p(x)]
+
+#computes the gini index cost
+def cost_gini_index(labels):
+    class_probs = np.bincount(labels) / len(labels)
+    return 1 - np.sum(np.square(class_probs))               #expression for gini index 1-\sigma p(x)^2
+
+# The same costs computed from class counts of shape [num_candidates, num_classes], so that every split candidate of a
+# feature is evaluated at once.
+
+def counts_misclassification(counts):
+    class_probs = counts / np.sum(counts, axis=-1, keepdims=True)
+    return 1 - np.max(class_probs, axis=-1)
+
+def counts_entropy(counts):
+    class_probs = counts / np.sum(counts, axis=-1, keepdims=True)
+    #0 log(0) is taken as 0, like removing the 0 probabilities in cost_entropy
+    log_probs = np.log(class_probs, out=np.zeros_like(class_probs), where=class_probs > 0)
+    return -np.sum(class_probs * log_probs, axis=-1)
+
+def counts_gini_index(counts):
+    class_probs = counts / np.sum(counts, axis=-1, keepdims=True)
+    return 1 - np.sum(np.square(class_probs), axis=-1)
+
+#cost functions with a counts based version, any other cost_fn is evaluated candidate by candidate
+_counts_cost_fns = {cost_misclassification: counts_misclassification, cost_entropy: counts_entropy, cost_gini_index: counts_gini_index}
+#their code in the compiled split scan
+_jit_cost_codes = {counts_misclassification: 0, counts_entropy: 1, counts_gini_index: 2}
+
+# We also need a function that returns the best possible test. One possible way of doing so is simply to consider all
+# possible feature-value combinations for splitting the data.
+#
+# The samples of the node are sorted once per feature and the class counts on the left of every test value are read
+# from the cumulative class counts of the sorted labels, which gives the cost of all test values of a feature at once
+# in O(n log n).
+
+#returns the lowest cost split of samples whose feature values are sorted, with the corresponding labels, and the test value of that split
+def best_threshold(values, labels, num_classes, counts_cost_fn, num_instances):
+    #the compiled scan averages the values in float64, float32 values go through the numpy code to keep float32 test values
+    if _backend == 'numba' and counts_cost_fn in _jit_cost_codes and values.dtype != np.float32:
+        cost, test = _kernels()['best_threshold'](np.asarray(values), np.asarray(labels), num_classes, _jit_cost_codes[counts_cost_fn], num_instances)
+        return (cost, test) if cost < np.inf else (np.inf, None)
+    num_samples = values.shape[0]
+    #test value candidates are the averages of consecutive sorted feature values
+    test_candidates = (values[1:] + values[:-1]) / 2.
+    #number of samples on the left of each test value
+    num_left = np.searchsorted(values, test_candidates, side='right')
+    #we can't have a split where a child has zero element, and a test value splitting the samples like the previous one
+    #(duplicate feature values) can't have a lower cost so it is skipped
+    valid = (num_left > 0) & (num_left < num_samples)
+    valid[1:] &= num_left[1:] != num_left[:-1]
+    candidates = np.flatnonzero(valid)
+    if candidates.shape[0] == 0:
+        return np.inf, None
+    num_left = num_left[candidates]
+    num_right = num_samples - num_left
+    #cumulative class counts of the sorted labels, row i counts the classes of the first i samples
+    cum_counts = np.zeros((num_samples + 1, num_classes), dtype=np.int64)
+    np.cumsum(np.eye(num_classes, dtype=np.int64)[labels], axis=0, out=cum_counts[1:])
+    left_counts = cum_counts[num_left]
+    right_counts = cum_counts[num_samples] - left_counts
+    #get the combined cost using the weighted sum of left and right cost
+    costs = (num_left * counts_cost_fn(left_counts) + num_right * counts_cost_fn(right_counts)) / num_instances
+    #argmin returns the first lowest cost, like the strict comparison of the candidate by candidate search
+    best = np.argmin(costs)
+    return costs[best], test_candidates[candidates[best]]
+
+#data_indices are the samples of the node, sorted_indices optionally the same indices sorted along each feature (shape [num_features, num_indices]),
+#pool optionally an executor searching the features in parallel
+def greedy_test(data, labels, data_indices, cost_fn, num_classes=None, sorted_indices=None, pool=None):
+    counts_cost_fn = _counts_cost_fns.get(cost_fn)
+    if counts_cost_fn is None:
+        return greedy_test_exhaustive(data, labels, data_indices, cost_fn)
+    if num_classes is None:
+        num_classes = np.max(labels) + 1
+    #initialize the best parameter values
+    best_cost = np.inf
+    best_feature, best_value = None, None
+    num_instances, num_features = data.shape
+    def feature_test(f):
+        #data indices sorted along the f-th feature, presorted by the TreeBuilder or sorted here
+        if sorted_indices is not None:
+            sorted_f = sorted_indices[f]
+        else:
+            sorted_f = data_indices[np.argsort(data[data_indices, f], kind='stable')]
+        return best_threshold(data[sorted_f, f], labels[sorted_f], num_classes, counts_cost_fn, num_instances)
+    #the results come back in feature order, so the first feature with the lowest cost wins however they are computed
+    for f, (cost, test) in enumerate(map(feature_test, range(num_features)) if pool is None else pool.map(feature_test, range(num_features))):
+        #update only when a lower cost is encountered
+        if cost < best_cost:
+            best_cost = cost
+            best_feature = f
+            best_value = test
+    return best_cost, best_feature, best_value
+
+# For other cost functions every feature-value combination is tested one by one.
+
+def greedy_test_exhaustive(data, labels, data_indices, cost_fn):
+    #initialize the best parameter values
+    best_cost = np.inf
+    best_feature, best_value = None, None
+    num_instances, num_features = data.shape
+    #sort the features to get the test value candidates by taking the average of consecutive sorted feature values 
+    data_sorted = np.sort(data[data_indices],axis=0)
+    test_candidates = (data_sorted[1:] + data_sorted[:-1]) / 2.
+    for f in range(num_features):
+        #stores the data corresponding to the f-th feature
+        data_f = data[data_indices, f]
+        for test in test_candidates[:,f]:
+            #Split the indices using the test value of f-th feature
+            left_indices = data_indices[data_f <= test]
+            right_indices = data_indices[data_f > test]
+            #we can't have a split where a child has zero element
+            #if this is true over all the test features and their test values  then the function returns the best cost as infinity
+            if len(left_indices) == 0 or len(right_indices) == 0:                
+                continue
+            #compute the left and right cost based on the current split                                                         
+            left_cost = cost_fn(labels[left_indices])
+            right_cost = cost_fn(labels[right_indices])
+            num_left, num_right = left_indices.shape[0], right_indices.shape[0]
+            #get the combined cost using the weighted sum of left and right cost
+            cost = (num_left * left_cost + num_right * right_cost)/num_instances
+            #update only when a lower cost is encountered
+            if cost < best_cost:
+                best_cost = cost
+                best_feature = f
+                best_value = test
+    return best_cost, best_feature, best_value
+
+# For large training sets the features can instead be quantized into at most max_bins bins once, the splits are then
+# searched between bins from per node class histograms.
+
+#the values separating the bins of a feature, a value x falls in bin np.searchsorted(thresholds, x) so that x <= thresholds[b] exactly when its bin is <= b
+def bin_thresholds(values, max_bins, binning='quantile'):
+    unique_values = np.unique(values)
+    if unique_values.shape[0] <= max_bins:
+        #every distinct value gets its own bin, so every node can be split into the same partitions as greedy_test finds. The
+        #thresholds are midpoints between neighbouring values of the whole training set, while greedy_test takes midpoints
+        #between values of the node, so below the root the thresholds and the predictions between them can differ
+        return (unique_values[1:] + unique_values[:-1]) / 2.
+    if binning == 'quantile':
+        thresholds = np.quantile(values, np.linspace(0, 1, max_bins + 1)[1:-1])
+    elif binning == 'uniform':
+        thresholds = np.linspace(unique_values[0], unique_values[-1], max_bins + 1)[1:-1]
+    else:
+        raise ValueError(f"unknown binning {binning!r}, expected 'quantile' or 'uniform'")
+    return np.unique(thresholds)
+
+#class histograms of the given data indices, an array of shape [num_features, num_bins, num_classes]
+def class_histogram(binned, labels, data_indices, num_bins, num_classes):
+    num_features = binned.shape[1]
+    #flattened (feature, bin, class) position of every sample and feature
+    flat = (np.arange(num_features) * num_bins + binned[data_indices].astype(np.int64)) * num_classes + labels[data_indices, None]
+    return np.bincount(flat.ravel(), minlength=num_features * num_bins * num_classes).reshape(num_features, num_bins, num_classes)
+
+#returns the lowest cost split given the class histograms of a node: the cost, the feature and the last bin going to the left child
+def histogram_test(histogram, counts_cost_fn, num_instances):
+    #class counts on the left of the split after every bin of every feature
+    left_counts = np.cumsum(histogram, axis=1)[:,:-1]
+    class_counts = np.sum(histogram[0], axis=0)
+    num_samples = np.sum(class_counts)
+    num_left = np.sum(left_counts, axis=-1)
+    #like greedy_test, splits with an empty child and splits equal to the previous one (empty bins) are skipped
+    valid = (num_left > 0) & (num_left < num_samples)
+    valid[:,1:] &= num_left[:,1:] != num_left[:,:-1]
+    features, bins = np.nonzero(valid)
+    if features.shape[0] == 0:
+        return np.inf, None, None
+    left_counts = left_counts[features, bins]
+    num_left = num_left[features, bins]
+    right_counts = class_counts - left_counts
+    #get the combined cost using the weighted sum of left and right cost
+    costs = (num_left * counts_cost_fn(left_counts) + (num_samples - num_left) * counts_cost_fn(right_counts)) / num_instances
+    #candidates are ordered by feature then bin, argmin keeps the first lowest cost like greedy_test
+    best = np.argmin(costs)
+    return costs[best], features[best], bins[best]
+
+# After fitting, the tree is compiled into parallel arrays so that predict advances all the samples one level at a
+# time with vectorized gathers.
+
+class FlatTree:
+    def __init__(self, feature, threshold, left, right, value):
+        self.feature = feature                              #the split feature of every node, -1 for leaves
+        self.threshold = threshold                          #the split value of every node, samples with feature <= threshold go left
+        self.left = left                                    #the index of the left child of every node, -1 for leaves
+        self.right = right                                  #the index of the right child of every node, -1 for leaves
+        self.value = value                                  #the class probabilities of every node, shape [num_nodes, num_classes]
+
+    @classmethod
+    def from_node(cls, root, num_classes):
+        #number the nodes in depth first order, the root is node 0
+        nodes = []
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            nodes.append(node)
+            if node.left:
+                stack.extend((node.right, node.left))
+        ids = {id(node): i for i, node in enumerate(nodes)}
+        feature = np.array([node.split_feature if node.left else -1 for node in nodes], dtype=np.int64)
+        threshold = np.array([node.split_value if node.left else 0. for node in nodes], dtype=float)
+        left = np.array([ids[id(node.left)] if node.left else -1 for node in nodes], dtype=np.int64)
+        right = np.array([ids[id(node.right)] if node.left else -1 for node in nodes], dtype=np.int64)
+        value = np.array([node.class_prob for node in nodes], dtype=float).reshape(len(nodes), num_classes)
+        return cls(feature, threshold, left, right, value)
+
+    def apply(self, data_test):
+        ''' Index of the leaf reached by every test sample'''
+        if _backend == 'numba':
+            return _kernels()['apply'](np.asarray(data_test), self.feature, self.threshold, self.left, self.right)
+        nodes = np.zeros(data_test.shape[0], dtype=np.int64)
+        #samples that have not reached a leaf yet
+        active = np.flatnonzero(self.left[nodes] >= 0)
+        while active.shape[0] > 0:
+            current = nodes[active]
+            go_left = data_test[active, self.feature[current]] <= self.threshold[current]
+            nodes[active] = np.where(go_left, self.left[current], self.right[current])
+            active = active[self.left[nodes[active]] >= 0]
+        return nodes
+
+    def leaf_boxes(self, num_features):
+        ''' Region of every leaf as the leaf indices and the bounds lower and upper of shape [num_leaves, num_features], the
+        samples with lower < x <= upper along every feature reach the leaf'''
+        lower = np.full((self.left.shape[0], num_features), -np.inf)
+        upper = np.full((self.left.shape[0], num_features), np.inf)
+        level = np.array([0])
+        while level.shape[0] > 0:
+            split = level[self.left[level] >= 0]
+            left, right, feature = self.left[split], self.right[split], self.feature[split]
+            #the children start with the region of their parent, which their split cuts along the split feature
+            lower[left], upper[left] = lower[split], upper[split]
+            lower[right], upper[right] = lower[split], upper[split]
+            upper[left, feature] = np.minimum(upper[split, feature], self.threshold[split])
+            lower[right, feature] = np.maximum(lower[split, feature], self.threshold[split])
+            level = np.concatenate((left, right))
+        leaves = np.flatnonzero(self.left < 0)
+        return leaves, lower[leaves], upper[leaves]
+
+    def node_depths(self):
+        ''' Depth of every node, the root is at depth 0'''
+        depths = np.zeros(self.left.shape[0], dtype=np.int64)
+        level, depth = np.array([0]), 0
+        while level.shape[0] > 0:
+            depths[level] = depth
+            split = level[self.left[level] >= 0]
+            level, depth = np.concatenate((self.left[split], self.right[split])), depth + 1
+        return depths
+
+    def apply_depths(self, data_test, depths):
+        ''' Index of the node reached by every test sample when the tree is truncated at each of the given depths,
+        shape [len(depths), num_test]. A single traversal records the node of every sample after each level'''
+        depths = np.asarray(depths)
+        reached = np.zeros((depths.shape[0], data_test.shape[0]), dtype=np.int64)
+        nodes = np.zeros(data_test.shape[0], dtype=np.int64)
+        active = np.flatnonzero(self.left[nodes] >= 0)
+        depth = 0
+        while active.shape[0] > 0 and depth < np.max(depths, initial=0):
+            reached[depths == depth] = nodes
+            current = nodes[active]
+            go_left = data_test[active, self.feature[current]] <= self.threshold[current]
+            nodes[active] = np.where(go_left, self.left[current], self.right[current])
+            active = active[self.left[nodes[active]] >= 0]
+            depth += 1
+        #every sample has reached a leaf or the deepest requested depth
+        reached[depths >= depth] = nodes
+        return reached
+
+# The TreeBuilder owns the training data while a tree is fitted. The data indices of all the nodes live in one shared
+# buffer that is partitioned in place, node i covering indices[start:end], and for the exact split search a second
+# buffer holds the same indices sorted along every feature, computed once and partitioned stably down the tree.
+
+class TreeBuilder:
+    def __init__(self, tree, data, labels, sorted_indices=None):
+        self.tree = tree
+        self.data = data
+        self.labels = labels
+        self.indices = np.arange(data.shape[0])
+        #marks the data indices going to the left child while a node is split
+        self.goes_left = np.zeros(data.shape[0], dtype=bool)
+        #executor searching the features of the large nodes in parallel during a parallel build
+        self.feature_pool = None
+        if tree.max_bins is not None:
+            #the nodes only see the bin of every value, stored in the smallest unsigned integer type that fits
+            self.bin_thresholds = [bin_thresholds(data[:,f], tree.max_bins, tree.binning) for f in range(data.shape[1])]
+            self.binned = np.empty(data.shape, dtype=np.uint8 if tree.max_bins <= 2**8 else np.uint16)
+            for f, thresholds in enumerate(self.bin_thresholds):
+                self.binned[:,f] = np.searchsorted(thresholds, data[:,f])
+            self.num_bins = max(thresholds.shape[0] for thresholds in self.bin_thresholds) + 1
+        elif sorted_indices is not None:
+            #the buffer is partitioned in place so the caller's array is copied
+            self.sorted_indices = np.array(sorted_indices, dtype=np.int64, order='C')
+        else:
+            #the data is sorted along every feature only once, one column at a time so that a memory-mapped store is never
+            #read whole
+            self.sorted_indices = np.empty(data.shape[::-1], dtype=np.int64)
+            for f in range(data.shape[1]):
+                self.sorted_indices[f] = np.argsort(data[:,f], kind='stable')
+
+    def build(self):
+        ''' Fits the tree and returns its root'''
+        root = self._new_node(0, 0, self.data.shape[0])
+        histogram = None
+        if self.tree.max_bins is not None:
+            histogram = class_histogram(self.binned, self.labels, self.indices, self.num_bins, self.tree.num_classes)
+        if self.tree.n_jobs is None:
+            self._fit_tree(root, 0, self.data.shape[0], histogram)
+        else:
+            self._fit_parallel(root, histogram)
+        return root
+
+    def _fit_parallel(self, root, histogram):
+        ''' Fits the tree with a pool of threads building independent subtrees. The subtrees of two nodes cover disjoint ranges
+        of the shared buffers and disjoint data indices, so the threads never write to the same elements, and every node is
+        split exactly as in the serial build'''
+        #the features of the large nodes are searched in a second pool, so a node waiting for them never blocks a node thread
+        with ThreadPoolExecutor(self.tree.n_jobs) as node_pool, ThreadPoolExecutor(self.tree.n_jobs) as self.feature_pool:
+            pending = {node_pool.submit(self._fit_task, root, 0, self.data.shape[0], histogram)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for child in future.result():
+                        pending.add(node_pool.submit(self._fit_task, *child))
+        self.feature_pool = None
+
+    def _fit_task(self, node, start, end, histogram):
+        #a large node is split and its children are handed back to the pool, a small one is built whole in this thread
+        if end - start < self.tree.min_parallel_samples:
+            self._fit_tree(node, start, end, histogram)
+            return []
+        return self._split(node, start, end, histogram)
+
+    def _new_node(self, depth, start, end):
+        #this is counting frequency of different labels in the region defined by the node
+        class_prob = np.bincount(self.labels[self.indices[start:end]], minlength=self.tree.num_classes)
+        if self.tree.stats is not None:
+            self.tree.stats.count('tree.nodes')
+        return Node(depth, class_prob / np.sum(class_prob))
+
+    def _fit_tree(self, node, start, end, histogram=None):
+        children = self._split(node, start, end, histogram)
+        #the children have their own histograms
+        histogram = None
+        #recursive call to the _fit_tree()
+        for child in children:
+            self._fit_tree(*child)
+
+    def _split(self, node, start, end, histogram=None):
+        ''' Splits the node and returns the (node, start, end, histogram) of its two children, or nothing for a leaf'''
+        tree = self.tree
+        #This gives the condition for termination of the recursion resulting in a leaf node
+        if node.depth == tree.max_depth or end - start <= tree.min_leaf_instances:
+            return []
+        data_indices = self.indices[start:end]
+        #every feature has a test value candidate between consecutive samples, or between consecutive bins
+        num_candidates = self.data.shape[1] * (end - start - 1 if tree.max_bins is None else self.num_bins - 1)
+        if tree.stats is not None:
+            tree.stats.count('tree.split_candidates', num_candidates)
+        #greedily select the best test by minimizing the cost
+        with _span(tree.stats, 'tree.split_search', depth=node.depth, num_samples=end - start, num_candidates=num_candidates):
+            if tree.max_bins is None:
+                pool = self.feature_pool if end - start >= tree.min_parallel_samples else None
+                cost, split_feature, split_value = greedy_test(self.data, self.labels, data_indices, tree.cost_fn, tree.num_classes,
+                                                               self.sorted_indices[:,start:end], pool)
+            else:
+                cost, split_feature, split_bin = histogram_test(histogram, _counts_cost_fns[tree.cost_fn], self.data.shape[0])
+        #if the cost returned is infinity it means that it is not possible to split the node and hence terminate
+        if np.isinf(cost):
+            return []
+        with _span(tree.stats, 'tree.partition', depth=node.depth, num_samples=end - start):
+            return self._partition(node, start, end, histogram, data_indices, split_feature,
+                                   split_value if tree.max_bins is None else split_bin)
+
+    def _partition(self, node, start, end, histogram, data_indices, split_feature, split):
+        ''' Stores the split of the node and partitions its samples between its two children'''
+        tree = self.tree
+        #to get a boolean array suggesting which data indices corresponding to this node are in the left of the split
+        if tree.max_bins is None:
+            split_value = split
+            test = self.data[data_indices,split_feature] <= split_value
+        else:
+            #the split is searched between bins, the test value is the threshold closing its last left bin
+            test = self.binned[data_indices,split_feature] <= split
+            split_value = self.bin_thresholds[split_feature][split]
+        #store the split feature and value of the node
+        node.split_feature = split_feature
+        node.split_value = split_value
+        #stable partition of the node's indices in place, the left child covers indices[start:mid] and the right child indices[mid:end]
+        left_indices = data_indices[test]
+        mid = start + left_indices.shape[0]
+        self.indices[start:end] = np.concatenate((left_indices, data_indices[np.logical_not(test)]))
+        if tree.max_bins is None:
+            #a stable partition of the sorted indices keeps those of each child sorted along every feature, in time linear in the node size
+            self.goes_left[left_indices] = True
+            sorted_indices = self.sorted_indices[:,start:end]
+            to_left = self.goes_left[sorted_indices]
+            self.goes_left[left_indices] = False
+            num_features = sorted_indices.shape[0]
+            self.sorted_indices[:,start:end] = np.concatenate((sorted_indices[to_left].reshape(num_features, -1),
+                                                               sorted_indices[np.logical_not(to_left)].reshape(num_features, -1)), axis=1)
+            left_histogram = right_histogram = None
+        else:
+            #only the histograms of the smaller child are counted, those of the larger child are the parent's minus the smaller child's
+            if mid - start <= end - mid:
+                left_histogram = class_histogram(self.binned, self.labels, self.indices[start:mid], self.num_bins, tree.num_classes)
+                right_histogram = histogram - left_histogram
+            else:
+                right_histogram = class_histogram(self.binned, self.labels, self.indices[mid:end], self.num_bins, tree.num_classes)
+                left_histogram = histogram - right_histogram
+            histogram = None
+        #define new nodes which are going to be the left and right child of the present node
+        left = self._new_node(node.depth + 1, start, mid)
+        right = self._new_node(node.depth + 1, mid, end)
+        #assign the left and right child to present child
+        node.left = left
+        node.right = right
+        return [(left, start, mid, left_histogram), (right, mid, end, right_histogram)]
+
+# Next, we define the Decision Tree class
+
+class DecisionTree:
+    def __init__(self, num_classes=None, max_depth=3, cost_fn=cost_misclassification, min_leaf_instances=1, max_bins=None, binning='quantile',
+                 n_jobs=None, min_parallel_samples=2048, stats=None):
+        self.max_depth = max_depth      
+        self.root = None
+        self.cost_fn = cost_fn
+        self.num_classes = num_classes
+        self.min_leaf_instances = min_leaf_instances
+        self.max_bins = max_bins        #None searches every test value, otherwise the features are quantized into at most max_bins bins
+        self.binning = binning          #'quantile' or 'uniform' bins when a feature has more than max_bins distinct values
+        self.n_jobs = n_jobs            #number of threads building subtrees in fit, None builds the tree in the calling thread
+        self.min_parallel_samples = min_parallel_samples    #nodes with fewer samples are built whole by one thread
+        self.stats = stats              #optional Profiler recording the nodes, split searches and traversals
+        if n_jobs is not None and n_jobs < 1:
+            raise ValueError(f'n_jobs must be None or at least 1, got {n_jobs}')
+        if max_bins is not None:
+            if not 2 <= max_bins <= 2**16:
+                raise ValueError('max_bins must be between 2 and 65536')
+            if cost_fn not in _counts_cost_fns:
+                raise ValueError('histogram split search needs a cost function with a counts based version')
+
+    def fit(self, data, labels, sorted_indices=None):
+        ''' sorted_indices optionally gives the data indices sorted along every feature, shape [num_features, num_samples], as
+        np.argsort(data, axis=0, kind='stable').T, when they are already known'''
+        if self.num_classes is None:
+            self.num_classes = np.max(labels) + 1
+        #the builder and its buffers are dropped once the tree is built, the fitted tree only keeps its nodes
+        self.root = TreeBuilder(self, data, labels, sorted_indices).build()
+        self.flat_tree = FlatTree.from_node(self.root, self.num_classes)
+        return self
+
+    def predict(self, data_test, depth=None):
+        #all the samples go down the tree together, the class probability of the leaf they reach is taken for prediction
+        if depth is None:
+            return self.flat_tree.value[self._apply(data_test)]
+        #the top depth levels of the tree are the tree fitted with max_depth=depth, its leaves are the nodes reached at that depth
+        return self.predict_depths(data_test, [depth])[0]
+
+    def predict_iter(self, batches):
+        ''' Makes the predictions of an iterable of test batches, each of shape [batch_size, D], and yields y_prob for every
+        batch as predict does. The outputs are views into a buffer reused by the next batch, copy them to keep them'''
+        y_prob = None
+        for data_test in batches:
+            data_test = np.asarray(data_test)
+            y_prob = _grow_buffer(y_prob, data_test.shape[0], self.flat_tree.value.shape[1], float)
+            #the leaf indices are valid so clip mode lets take write straight into the buffer
+            yield np.take(self.flat_tree.value, self._apply(data_test), axis=0, out=y_prob[:data_test.shape[0]], mode='clip')
+
+    def _apply(self, data_test):
+        if self.stats is None:
+            return self.flat_tree.apply(data_test)
+        with self.stats.span('tree.predict', num_test=data_test.shape[0]) as args:
+            leaves = self.flat_tree.apply(data_test)
+            #a sample takes one step per level down to its leaf. The span is passed to the callback when the block exits,
+            #so its arguments are set inside it
+            args['traversal_steps'] = int(np.sum(self.flat_tree.node_depths()[leaves]))
+        self.stats.count('tree.traversal_steps', args['traversal_steps'])
+        return leaves
+
+    def predict_grid(self, x0v, x1v):
+        ''' Class probabilities of every point of the grid of the sorted values x0v of the first feature and x1v of the second
+        one for a tree fitted on two features, shape [len(x1v), len(x0v), num_classes]. The regions of the leaves are painted
+        on the grid, which gives the same result as predict on every point without traversing the tree'''
+        if np.any(self.flat_tree.feature > 1):
+            raise ValueError('predict_grid needs a tree fitted on two features')
+        y_prob = np.empty((len(x1v), len(x0v), self.flat_tree.value.shape[1]))
+        leaves, lower, upper = self.flat_tree.leaf_boxes(2)
+        #the points of a leaf are those with lower < x <= upper along both features
+        col_start, col_stop = np.searchsorted(x0v, lower[:,0], side='right'), np.searchsorted(x0v, upper[:,0], side='right')
+        row_start, row_stop = np.searchsorted(x1v, lower[:,1], side='right'), np.searchsorted(x1v, upper[:,1], side='right')
+        for i, leaf in enumerate(leaves):
+            y_prob[row_start[i]:row_stop[i], col_start[i]:col_stop[i]] = self.flat_tree.value[leaf]
+        return y_prob
+
+    def predict_depths(self, data_test, depths):
+        ''' Predictions of the tree truncated at each of the given depths in a single traversal, shape [len(depths), num_test, num_classes].
+        The greedy splits of a tree fitted with max_depth=i are the top i levels of a deeper tree, so predict_depths(data_test, [i])[0]
+        is the prediction of DecisionTree(max_depth=i) for every i up to the max_depth of this tree'''
+        return self.flat_tree.value[self.flat_tree.apply_depths(data_test, depths)]
+
+# Memory-mapped feature store
+#
+# A training set can be written once to a .npy file of features and a .labels.npy sidecar of labels, and opened as
+# read-only memory maps. Processes that open the same store share one copy of it in the page cache. KNN then computes
+# distances one block of training samples at a time and the decision tree reads one feature column at a time when it
+# presorts the data, so neither loads the store whole.
+
+def _labels_path(path):
+    return os.path.splitext(path)[0] + '.labels.npy'
+
+#writes the features x as a .npy file of the given dtype at path and the labels y next to it, block by block so that x can
+#itself be a memory map, and returns the store opened with load_feature_store
+def save_feature_store(path, x, y, dtype=np.float64, block_size=2**16):
+    if x.shape[0] != y.shape[0]:
+        raise ValueError(f'{x.shape[0]} samples but {y.shape[0]} labels')
+    if np.dtype(dtype) not in (np.float32, np.float64):
+        raise ValueError('the feature store holds float32 or float64 features')
+    features = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=x.shape)
+    for start in range(0, x.shape[0], block_size):
+        features[start:start + block_size] = x[start:start + block_size]
+    features.flush()
+    del features
+    np.save(_labels_path(path), np.asarray(y))
+    return load_feature_store(path)
+
+#opens the features and labels written by save_feature_store as read-only memory maps, to pass to KNN.fit or DecisionTree.fit
+def load_feature_store(path):
+    x = np.load(path, mmap_mode='r')
+    y = np.load(_labels_path(path), mmap_mode='r')
+    if x.ndim != 2 or y.shape != (x.shape[0],):
+        raise ValueError(f'features of shape {x.shape} do not match labels of shape {y.shape}')
+    if y.dtype.kind not in 'iu':
+        raise ValueError('the labels of the feature store are not integers')
+    return x, y
+
+#yields consecutive blocks of batch_size rows of x, for example of a feature store, to feed predict_iter
+def iter_batches(x, batch_size):
+    for start in range(0, x.shape[0], batch_size):
+        yield x[start:start + batch_size]
+
+# Model serialization
+#
+# A fitted model is saved to a single file: a header describing the model, then every array of the model (the flat
+# arrays of a decision tree, the training data of KNN and the node arrays of its spatial index) in its raw bytes at an
+# offset aligned to 64 bytes. load_model maps the file read-only and returns a model whose arrays are views into the
+# mapping, so nothing is read or copied until predict touches it and processes loading the same file share its pages.
+# Distance and cost functions are saved by name, the profiler is not saved.
+
+_MODEL_MAGIC = b'KNNDTMDL'
+MODEL_FORMAT_VERSION = 1
+_ALIGNMENT = 64
+
+#the functions a model can be saved with
+_model_functions = {'euclidean': euclidean, 'manhattan': manhattan, 'cost_misclassification': cost_misclassification,
+                    'cost_entropy': cost_entropy, 'cost_gini_index': cost_gini_index}
+
+#the constructor arguments and the arrays saved for every model and spatial index class
+_model_params = {KNN: ('K', 'dist_fn', 'memory_budget', 'index', 'leaf_size', 'num_trees', 'num_probes', 'train_block_size', 'n_jobs'),
+                 DecisionTree: ('num_classes', 'max_depth', 'cost_fn', 'min_leaf_instances', 'max_bins', 'binning', 'n_jobs',
+                                'min_parallel_samples')}
+_index_arrays = {KDTree: ('indices', 'start', 'end', 'left', 'right', 'lower', 'upper'),
+                 BallTree: ('indices', 'start', 'end', 'left', 'right', 'center', 'radius'),
+                 RandomProjectionForest: ('indices', 'direction', 'threshold', 'start', 'end', 'left', 'right', 'roots')}
+_flat_tree_arrays = ('feature', 'threshold', 'left', 'right', 'value')
+
+def _function_name(fn):
+    for name, known in _model_functions.items():
+        if fn is known:
+            return name
+    raise ValueError(f'cannot save a model using {fn!r}, only the functions {list(_model_functions)} are saved by name')
+
+def _aligned(offset):
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
+
+#saves a fitted KNN or DecisionTree to path
+def save_model(model, path):
+    if type(model) not in _model_params:
+        raise ValueError(f'cannot save a {type(model).__name__}, expected a KNN or a DecisionTree')
+    params = {}
+    for name in _model_params[type(model)]:
+        value = getattr(model, name)
+        params[name] = _function_name(value) if callable(value) else value.item() if isinstance(value, np.generic) else value
+    arrays = {}
+    if isinstance(model, KNN):
+        if not hasattr(model, 'x'):
+            raise ValueError('cannot save a KNN that was not fitted')
+        arrays['x'], arrays['y'] = np.asarray(model.x), np.asarray(model.y)
+        if model.dist_fn is euclidean:
+            arrays['x_sq_norms'] = model.x_sq_norms
+        if model.index is not None:
+            for name in _index_arrays[type(model.index_tree)]:
+                arrays[f'index_tree.{name}'] = getattr(model.index_tree, name)
+    else:
+        if not hasattr(model, 'flat_tree'):
+            raise ValueError('cannot save a DecisionTree that was not fitted')
+        for name in _flat_tree_arrays:
+            arrays[f'flat_tree.{name}'] = getattr(model.flat_tree, name)
+    #the offsets are relative to the start of the data, the first aligned byte after the header
+    table, offset = {}, 0
+    for name, array in arrays.items():
+        if array.dtype.hasobject:
+            raise ValueError(f'cannot save the {name} array of dtype object')
+        table[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset = _aligned(offset + array.nbytes)
+    header = json.dumps({'model': type(model).__name__, 'params': params, 'arrays': table}).encode()
+    data_start = _aligned(len(_MODEL_MAGIC) + 8 + len(header))
+    with open(path, 'wb') as f:
+        f.write(_MODEL_MAGIC + np.array([MODEL_FORMAT_VERSION, len(header)], dtype='<u4').tobytes() + header)
+        for name, array in arrays.items():
+            f.seek(data_start + table[name]['offset'])
+            #tofile writes the bytes of a contiguous array, a memory map included, without copying it
+            np.ascontiguousarray(array).tofile(f)
+        f.truncate(data_start + offset)
+
+#opens a model written by save_model, its arrays are read-only views of the memory mapped file
+def load_model(path):
+    with open(path, 'rb') as f:
+        prefix = f.read(len(_MODEL_MAGIC) + 8)
+        if len(prefix) < len(_MODEL_MAGIC) + 8 or prefix[:len(_MODEL_MAGIC)] != _MODEL_MAGIC:
+            raise ValueError(f'{path} is not a saved model')
+        version, header_size = np.frombuffer(prefix, dtype='<u4', offset=len(_MODEL_MAGIC))
+        if version != MODEL_FORMAT_VERSION:
+            raise ValueError(f'{path} was saved in format version {version}, this version reads {MODEL_FORMAT_VERSION}')
+        header = json.loads(f.read(int(header_size)))
+    data_start = _aligned(len(_MODEL_MAGIC) + 8 + int(header_size))
+    mapping = np.memmap(path, dtype=np.uint8, mode='r')
+    table = header['arrays']
+    def array(name):
+        spec = table[name]
+        dtype, count = np.dtype(spec['dtype']), int(np.prod(spec['shape']))
+        start = data_start + spec['offset']
+        return mapping[start:start + count * dtype.itemsize].view(dtype).reshape(spec['shape'])
+    model_class = {cls.__name__: cls for cls in _model_params}[header['model']]
+    params = {name: _model_functions[value] if name in ('dist_fn', 'cost_fn') else value for name, value in header['params'].items()}
+    model = model_class(**params)
+    if isinstance(model, KNN):
+        #the training set is a memory map like a feature store, so predict reads it block by block
+        model.x, model.y = array('x'), np.asarray(array('y'))
+        model.C = int(np.max(model.y)) + 1
+        if model.dist_fn is euclidean:
+            model.x_sq_norms = np.asarray(array('x_sq_norms'))
+            model.x_float = None if model._train_blocks() is not None else np.asarray(model.x, dtype=float)
+        if model.index is not None:
+            index_class = _spatial_indexes[model.index]
+            model.index_tree = index_class.__new__(index_class)
+            model.index_tree.x, model.index_tree.dist_fn = np.asarray(model.x, dtype=float), model.dist_fn
+            model.index_tree.leaf_size = model.leaf_size
+            if index_class is RandomProjectionForest:
+                model.index_tree.num_trees, model.index_tree.num_probes = model.num_trees, model.num_probes
+            for name in _index_arrays[index_class]:
+                setattr(model.index_tree, name, np.asarray(array(f'index_tree.{name}')))
+    else:
+        #predict only needs the flat arrays, the nodes of the fitted tree are not saved
+        model.flat_tree = FlatTree(*[np.asarray(array(f'flat_tree.{name}')) for name in _flat_tree_arrays])
+    return model
+
+# Experiment runner
+#
+# Repeated random splits of a dataset are evaluated in parallel. The data is converted to numpy once and placed in
+# shared memory that every worker process maps without copying, the (split, configuration) jobs are spread over the
+# workers and each job derives its random split and model seed from the experiment seed, so the results do not depend
+# on the number of workers or the order the jobs run in.
+
+#state of a worker process: views on the shared data and the model configurations
+_runner_state = {}
+
+#multiprocessing is imported by the runner only, it is not needed to fit and predict
+def _init_runner(x_spec, y_spec, configs):
+    from multiprocessing import shared_memory
+    _runner_state['shared'] = []
+    for name, (shm_name, shape, dtype) in (('x', x_spec), ('y', y_spec)):
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _runner_state['shared'].append(shm)
+        _runner_state[name] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    _runner_state['configs'] = configs
+
+#the workers already run in parallel, so their kernels run serially instead of each starting a pool of threads
+def _init_worker(x_spec, y_spec, configs):
+    global _parallel_kernels
+    _parallel_kernels = False
+    _init_runner(x_spec, y_spec, configs)
+
+def _run_job(split, config_index, seed, data_separator):
+    x, y = _runner_state['x'], _runner_state['y']
+    name, (model_class, kwargs) = _runner_state['configs'][config_index]
+    #every configuration of a split sees the same train/test separation
+    inds = np.random.default_rng([seed, split]).permutation(x.shape[0])
+    x_train, y_train = x[inds[:data_separator]], y[inds[:data_separator]]
+    x_test, y_test = x[inds[data_separator:]], y[inds[data_separator:]]
+    #random projection forests get a seed of their own through the model, the global generator of the caller is not touched
+    #since the serial runner runs the jobs in the calling process
+    if model_class is KNN and 'seed' not in kwargs:
+        kwargs = dict(kwargs, seed=np.random.SeedSequence([seed, split, config_index]))
+    prediction = model_class(**kwargs).fit(x_train, y_train).predict(x_test)
+    #KNN.predict also returns the nearest neighbours
+    y_prob = prediction[0] if isinstance(prediction, tuple) else prediction
+    accuracy = np.sum(np.argmax(y_prob, axis=-1) == y_test) / y_test.shape[0]
+    return {'split': split, 'config': name, 'accuracy': accuracy * 100}
+
+def _share(array, shared):
+    from multiprocessing import shared_memory
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    shared.append(shm)
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    return shm.name, array.shape, array.dtype
+
+#evaluates every model configuration on num_splits random splits of the dataset and returns a table with one accuracy per (split, config).
+#configs maps a name to a (model class, constructor arguments) pair, e.g. {'euclidean': (KNN, {'K': 6, 'dist_fn': euclidean})}
+#The jobs run in the calling process unless n_jobs > 1 is given, starting worker processes only pays off when the jobs are
+#slow. With n_jobs > 1 the configurations are pickled to worker processes that import the calling script, so they cannot
+#hold lambdas and the script must start the experiments under if __name__ == '__main__'
+def run_experiments(dataset, features, target, configs, num_splits, data_separator, n_jobs=None, seed=None):
+    x = np.ascontiguousarray(dataset[features].to_numpy())
+    y = np.ascontiguousarray(dataset[target].to_numpy())
+    if seed is None:
+        #follow the global generator so that runs of the script stay reproducible
+        seed = np.random.randint(2**31)
+    configs = list(configs.items())
+    jobs = [(split, c) for split in range(num_splits) for c in range(len(configs))]
+    n_jobs = min(n_jobs or 1, len(jobs))
+    shared = []
+    try:
+        if n_jobs <= 1:
+            #the jobs run here and read the data directly, without copying it to shared memory
+            _runner_state.update(x=x, y=y, configs=configs)
+            rows = [_run_job(split, c, seed, data_separator) for split, c in jobs]
+        else:
+            x_spec, y_spec = _share(x, shared), _share(y, shared)
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            #the workers are not forked from this process, which may already run the threads of a parallel numba kernel that
+            #a forked child cannot shut down, so the configurations are pickled and must not hold lambdas
+            start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            context = multiprocessing.get_context(start_method)
+            with ProcessPoolExecutor(n_jobs, mp_context=context, initializer=_init_worker, initargs=(x_spec, y_spec, configs)) as pool:
+                rows = list(pool.map(_run_job, *zip(*jobs), [seed] * len(jobs), [data_separator] * len(jobs)))
+    finally:
+        _runner_state.clear()
+        for shm in shared:
+            shm.close()
+            shm.unlink()
+    import pandas as pd
+    return pd.DataFrame(rows)
+
+# Cross-validation
+#
+# k-fold cross-validation without multiplying the cost by k: for KNN the distances between all the samples are
+# computed once and every fold selects the neighbours of its test samples among the columns of its training samples,
+# and for decision trees the features are sorted once and every fold fits on the presorted order restricted to its
+# training samples.
+
+#splits the shuffled sample indices into num_folds folds, each sorted
+def kfold_indices(num_samples, num_folds, seed=None):
+    permutation = np.random.default_rng(seed).permutation(num_samples)
+    return [np.sort(fold) for fold in np.array_split(permutation, num_folds)]
+
+def _knn_folds(model, x, y, folds):
+    #the model fitted on all the samples gives the distances between all of them, computed by blocks within its memory budget
+    model.fit(x, y)
+    start = time.perf_counter()
+    distances = np.empty((x.shape[0], x.shape[0]))
+    block_size = model._block_size(x.shape[0])
+    for block in range(0, x.shape[0], block_size):
+        distances[block:block + block_size] = model._distances(x[block:block + block_size], squared=True)
+    setup_s = time.perf_counter() - start
+    rows = []
+    for test in folds:
+        start = time.perf_counter()
+        train = np.setdiff1d(np.arange(x.shape[0]), test)
+        #train is sorted so ties are still broken by the lower training index, like a KNN fitted on x[train]
+        knns = train[_select_k_nearest(distances[np.ix_(test, train)], model.K)]
+        y_prob = _knn_vote(y[knns], model.C)
+        rows.append({'fit_s': 0., 'predict_s': time.perf_counter() - start, 'y_prob': y_prob})
+    return setup_s, rows
+
+def _tree_folds(model, x, y, folds):
+    start = time.perf_counter()
+    sorted_indices = np.argsort(x, axis=0, kind='stable').T if model.max_bins is None else None
+    setup_s = time.perf_counter() - start
+    #position of every sample among the training samples of the current fold
+    position = np.empty(x.shape[0], dtype=np.int64)
+    rows = []
+    for test in folds:
+        start = time.perf_counter()
+        in_train = np.ones(x.shape[0], dtype=bool)
+        in_train[test] = False
+        train = np.flatnonzero(in_train)
+        fold_sorted = None
+        if sorted_indices is not None:
+            #restricting the sorted order to the training samples keeps it sorted, it is then renumbered for x[train]
+            position[train] = np.arange(train.shape[0])
+            fold_sorted = position[sorted_indices[in_train[sorted_indices]].reshape(x.shape[1], -1)]
+        model.fit(x[train], y[train], sorted_indices=fold_sorted)
+        fitted = time.perf_counter()
+        y_prob = model.predict(x[test])
+        rows.append({'fit_s': fitted - start, 'predict_s': time.perf_counter() - fitted, 'y_prob': y_prob})
+    return setup_s, rows
+
+#k-fold cross-validation of an unfitted KNN or DecisionTree, returns a table of per fold accuracies and timings
+#and a summary with the mean and standard deviation of the accuracy and the total time
+def cross_validate(model, x, y, num_folds=5, seed=None):
+    start = time.perf_counter()
+    folds = kfold_indices(x.shape[0], num_folds, seed)
+    model = copy.copy(model)
+    if isinstance(model, KNN) and model.index != 'rp_forest':
+        setup_s, rows = _knn_folds(model, x, y, folds)
+    elif isinstance(model, DecisionTree):
+        #every fold predicts the classes of the whole dataset
+        if model.num_classes is None:
+            model.num_classes = np.max(y) + 1
+        setup_s, rows = _tree_folds(model, x, y, folds)
+    else:
+        #approximate neighbours come from an index built on the training samples of each fold
+        setup_s, rows = 0., []
+        for test in folds:
+            train = np.setdiff1d(np.arange(x.shape[0]), test)
+            fold_start = time.perf_counter()
+            model.fit(x[train], y[train])
+            fitted = time.perf_counter()
+            y_prob, _ = model.predict(x[test])
+            rows.append({'fit_s': fitted - fold_start, 'predict_s': time.perf_counter() - fitted, 'y_prob': y_prob})
+    for fold, (test, row) in enumerate(zip(folds, rows)):
+        row['fold'] = fold
+        row['accuracy'] = np.sum(np.argmax(row.pop('y_prob'), axis=-1) == y[test]) / test.shape[0] * 100
+    import pandas as pd
+    results = pd.DataFrame(rows, columns=['fold', 'accuracy', 'fit_s', 'predict_s'])
+    summary = {'mean_accuracy': results['accuracy'].mean(), 'std_accuracy': results['accuracy'].std(ddof=0),
+               'setup_s': setup_s, 'total_s': time.perf_counter() - start}
+    return results, summary
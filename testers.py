@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""Helpers to fit, evaluate and plot the models of models.py on two features.
+
+matplotlib is imported by the methods drawing figures only, so the testers can be imported and used to fit and score the
+models without it.
+"""
+
+import numpy as np
+
+color_map = 'coolwarm'
+
+def plot_test_and_train_data(x_train, y_train, x_test, y_test, x_feature, y_feature):
+    import matplotlib.pyplot as plt
+    plt.scatter(x_train[:,0], x_train[:,1], c=y_train, cmap=color_map, marker='o', label='train')
+    plt.scatter(x_test[:,0], x_test[:,1], c=y_test, cmap=color_map, marker='s', label='test')
+    plt.legend()
+    plt.xlabel(x_feature)
+    plt.ylabel(y_feature)
+    plt.show()
+
+#class probabilities as RGB colors, one channel per class, padded with zeros for fewer than 3 classes
+def grid_colors(y_prob):
+    colors = np.zeros(y_prob.shape[:-1] + (3,))
+    colors[..., :min(3, y_prob.shape[-1])] = y_prob[..., :3]
+    return colors
+
+class KNNTester:
+    def __init__(self, model, x_train, y_train, x_test, y_test, feature1, feature2):
+        self.model = model
+        self.x_train = x_train
+        self.y_train = y_train
+        self.x_test = x_test
+        self.y_test = y_test
+        self.feature1 = feature1
+        self.feature2 = feature2
+
+    def train(self):
+        self.y_prob, self.knns = self.model.fit(self.x_train, self.y_train).predict(self.x_test)
+
+    def get_accuracy(self):
+        #To get hard predictions by choosing the class with the maximum probability
+        self.y_pred = np.argmax(self.y_prob, axis=-1)
+        accuracy = np.sum(self.y_pred == self.y_test)/self.y_test.shape[0]
+        return accuracy*100
+
+    def display_results(self):
+        import matplotlib.pyplot as plt
+        #boolean array to later slice the indexes of correct and incorrect predictions
+        correct = self.y_test == self.y_pred
+        incorrect = np.logical_not(correct)
+        
+        #visualation of the points
+        plt.scatter(self.x_train[:,0], self.x_train[:,1], c=self.y_train, marker='o', cmap=color_map, alpha=.2, label='train')
+        plt.scatter(self.x_test[correct,0], self.x_test[correct,1], marker='.', c=self.y_pred[correct], cmap=color_map, label='correct')
+        plt.scatter(self.x_test[incorrect,0], self.x_test[incorrect,1], marker='x', c=self.y_test[incorrect], cmap=color_map, label='misclassified')
+        
+        #connect each node to k-nearest neighbours in the training set
+        for i in range(self.x_test.shape[0]):
+            for k in range(self.model.K):
+                hor = self.x_test[i,0], self.x_train[self.knns[i,k],0]
+                ver = self.x_test[i,1], self.x_train[self.knns[i,k],1]
+                plt.plot(hor, ver, 'k-', alpha=.1)
+        
+        plt.xlabel(self.feature1)
+        plt.ylabel(self.feature2)
+        plt.legend()
+        plt.show()
+
+    def boundaries(self, x, y, resolution=500):
+        import matplotlib.pyplot as plt
+        #we can make the grid finer by increasing the resolution, only the points near a class change are predicted
+        x0v = np.linspace(np.min(x[:,0]), np.max(x[:,0]), resolution)
+        x1v = np.linspace(np.min(x[:,1]), np.max(x[:,1]), resolution)
+
+        y_train_prob = np.zeros((self.y_train.shape[0], self.model.C))
+        y_train_prob[np.arange(self.y_train.shape[0]), self.y_train] = 1
+
+        #to get the predicted class of all the points in the 2D grid, the model is only fit if it was not trained yet
+        if not hasattr(self.model, 'x'):
+            self.model.fit(self.x_train, self.y_train)
+        y_pred_all = np.eye(self.model.C)[self.model.classify_grid(x0v, x1v)]
+
+        plt.imshow(grid_colors(y_pred_all), extent=(x0v[0], x0v[-1], x1v[0], x1v[-1]), origin='lower', aspect='auto', alpha=.3)
+        plt.scatter(self.x_train[:,0], self.x_train[:,1], c=grid_colors(y_train_prob), marker='o', alpha=1)
+        plt.ylabel(self.feature2)
+        plt.xlabel(self.feature1)
+        plt.show()
+
+class DecisionTreeTester:
+    def __init__(self, tree, x_train, y_train, x_test, y_test, feature1, feature2):
+        self.tree = tree
+        self.x_train = x_train
+        self.y_train = y_train
+        self.x_test = x_test
+        self.y_test = y_test
+        self.feature1 = feature1
+        self.feature2 = feature2
+
+    def train(self):
+        probs_test = self.tree.fit(self.x_train, self.y_train).predict(self.x_test)
+        self.y_pred = np.argmax(probs_test,1)
+
+    def get_accuracy(self):
+        accuracy = np.sum(self.y_pred == self.y_test)/self.y_test.shape[0]
+        return accuracy*100
+
+    def display_results(self):
+        import matplotlib.pyplot as plt
+        #visualization
+        correct = self.y_test == self.y_pred
+        incorrect = np.logical_not(correct)
+
+        plt.scatter(self.x_train[:,0], self.x_train[:,1], c=self.y_train, marker='o', cmap=color_map, alpha=.2, label='train')
+        plt.scatter(self.x_test[correct,0], self.x_test[correct,1], marker='.', c=self.y_pred[correct], cmap=color_map, label='correct')
+        plt.scatter(self.x_test[incorrect,0], self.x_test[incorrect,1], marker='x', c=self.y_test[incorrect], cmap=color_map, label='misclassified')
+        plt.legend()
+        plt.xlabel(self.feature1)
+        plt.ylabel(self.feature2)
+        plt.show()
+
+    def boundaries(self, x, y, resolution=500):
+        import matplotlib.pyplot as plt
+        x0v = np.linspace(np.min(x[:,0]), np.max(x[:,0]), resolution)
+        x1v = np.linspace(np.min(x[:,1]), np.max(x[:,1]), resolution)
+
+        #the grid is painted leaf by leaf from the boxes of the leaves instead of predicting every point
+        if not hasattr(self.tree, 'flat_tree'):
+            self.tree.fit(self.x_train, self.y_train)
+        y_train_prob = np.zeros((self.y_train.shape[0], self.tree.num_classes))
+        y_train_prob[np.arange(self.y_train.shape[0]), self.y_train] = 1
+        y_prob_all = self.tree.predict_grid(x0v, x1v)
+        plt.imshow(grid_colors(y_prob_all), extent=(x0v[0], x0v[-1], x1v[0], x1v[-1]), origin='lower', aspect='auto', alpha=.3)
+        plt.scatter(self.x_train[:,0], self.x_train[:,1], c=grid_colors(y_train_prob), marker='o', alpha=1)
+        plt.ylabel(self.feature2)
+        plt.xlabel(self.feature1)
+        plt.show()
@@ -0,0 +1,105 @@
+"""The numpy code and the compiled kernels give the same results on data with many ties."""
+
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+pytest.importorskip('numba')
+
+import models
+from models import KNN, DecisionTree, manhattan
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
+
+#runs fn once with each backend and returns the two results
+def both_backends(fn):
+    previous = models._backend
+    try:
+        results = []
+        for backend in ('numpy', 'numba'):
+            models.set_backend(backend)
+            results.append(fn())
+        return results
+    finally:
+        models.set_backend(previous)
+
+@pytest.mark.parametrize('K', [1, 3, 7, 40, 60])
+def test_select_k_nearest(rng, K):
+    #few distinct distances, so most rows have ties at the K-th distance
+    distances = rng.integers(0, 5, (200, 50)).astype(float)
+    expected, got = both_backends(lambda: models._select_k_nearest(distances, K))
+    np.testing.assert_array_equal(expected, got)
+    #ties are broken by the lower training index
+    reference = np.lexsort((np.broadcast_to(np.arange(50), distances.shape), distances), axis=1)[:,:min(K, 50)]
+    np.testing.assert_array_equal(expected, reference)
+
+def test_manhattan_distances(rng):
+    x, y = rng.integers(0, 8, (300, 4)), rng.integers(0, 3, 300)
+    x_test = rng.integers(0, 8, (100, 4)).astype(float)
+    knn = KNN(K=5, dist_fn=manhattan).fit(x, y)
+    expected, got = both_backends(lambda: knn._distances(x_test))
+    np.testing.assert_array_equal(expected, got)
+    expected, got = both_backends(lambda: knn.predict(x_test))
+    np.testing.assert_array_equal(expected[0], got[0])
+    np.testing.assert_array_equal(expected[1], got[1])
+
+@pytest.mark.parametrize('counts_cost_fn', list(models._jit_cost_codes))
+def test_best_threshold(rng, counts_cost_fn):
+    for _ in range(50):
+        num_samples = int(rng.integers(1, 40))
+        values = np.sort(rng.integers(0, 6, num_samples)).astype(float)
+        labels = rng.integers(0, 3, num_samples)
+        (expected_cost, expected_test), (cost, test) = both_backends(
+            lambda: models.best_threshold(values, labels, 3, counts_cost_fn, num_samples))
+        assert test == expected_test
+        assert cost == pytest.approx(expected_cost, rel=1e-12, abs=1e-15)
+
+def test_flat_tree_apply(rng):
+    x, y = rng.integers(0, 8, (500, 3)), rng.integers(0, 3, 500)
+    flat_tree = DecisionTree(max_depth=8).fit(x, y).flat_tree
+    #test samples on the thresholds and on the training values
+    splits = flat_tree.threshold[flat_tree.left >= 0]
+    x_test = rng.choice(np.concatenate((splits, np.arange(8.))), (400, 3))
+    expected, got = both_backends(lambda: flat_tree.apply(x_test))
+    np.testing.assert_array_equal(expected, got)
+
+def test_serial_kernels_in_threads(rng):
+    #threads other than the main thread run the serial version of the kernels
+    distances = rng.integers(0, 5, (100, 30)).astype(float)
+    expected, _ = both_backends(lambda: models._select_k_nearest(distances, 4))
+    previous = models._backend
+    models.set_backend('numba')
+    try:
+        with ThreadPoolExecutor(2) as pool:
+            got = list(pool.map(lambda _: models._select_k_nearest(distances, 4), range(2)))
+    finally:
+        models.set_backend(previous)
+    for result in got:
+        np.testing.assert_array_equal(expected, result)
+
+def test_check_backends():
+    assert all(models.check_backends().values())
+
+def test_kernels_cached(rng):
+    #a new process loads the kernels compiled here from the cache, the serial and parallel versions from their own entries
+    test_serial_kernels_in_threads(rng)
+    script = (
+        'import threading, numpy as np, models\n'
+        'models.set_backend("numba")\n'
+        'distances = np.zeros((10, 30))\n'
+        'models._select_k_nearest(distances, 4)\n'
+        'thread = threading.Thread(target=models._select_k_nearest, args=(distances, 4))\n'
+        'thread.start()\n'
+        'thread.join()\n'
+        'select = models._kernels()["select_k_nearest"]\n'
+        'stats = [cell.cell_contents.stats for cell in select.__closure__ if hasattr(cell.cell_contents, "stats")]\n'
+        'print(sum(len(s.cache_hits) for s in stats), sum(len(s.cache_misses) for s in stats))\n')
+    output = subprocess.run([sys.executable, '-c', script], cwd=os.path.dirname(os.path.abspath(models.__file__)),
+                            capture_output=True, text=True, check=True).stdout
+    assert output.split() == ['2', '0']
@@ -0,0 +1,70 @@
+"""KNN on inputs the numpy backend has to handle without the compiled kernels."""
+
+import tracemalloc
+
+import numpy as np
+import pytest
+
+import models
+from models import KNN, manhattan
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
+
+@pytest.mark.parametrize('dtype', [np.uint8, np.int8, np.int16])
+def test_small_int_labels(rng, dtype):
+    #num_test * C overflows a uint8 when C keeps the dtype of the labels
+    x, y = rng.normal(size=(300, 2)), rng.integers(0, 3, 300)
+    x_test = rng.normal(size=(200, 2))
+    expected_prob, expected_knns = KNN(K=5).fit(x, y).predict(x_test)
+    y_prob, knns = KNN(K=5).fit(x, y.astype(dtype)).predict(x_test)
+    np.testing.assert_array_equal(knns, expected_knns)
+    np.testing.assert_array_equal(y_prob, expected_prob)
+
+def test_threads_share_memory_budget(rng, monkeypatch):
+    x, y = rng.normal(size=(500, 3)), rng.integers(0, 3, 500)
+    x_test = rng.normal(size=(300, 3))
+    expected = KNN(K=4).fit(x, y).predict(x_test)[1]
+    knn = KNN(K=4, memory_budget=200_000, n_jobs=4).fit(x, y)
+    block_sizes = []
+    knn_block = knn._knn_block
+    monkeypatch.setattr(knn, '_knn_block', lambda x_test, K, out: block_sizes.append(x_test.shape[0]) or knn_block(x_test, K, out))
+    np.testing.assert_array_equal(knn.predict(x_test)[1], expected)
+    #four blocks in flight at once stay within the budget of one
+    assert 4 * max(block_sizes) <= knn._block_size(x_test.shape[0])
+
+@pytest.mark.parametrize('dist_fn', [models.euclidean, manhattan])
+def test_ties_within_memory_budget(rng, dist_fn):
+    #few distinct values, so every test sample has ties to break at the K-th distance
+    x, y = rng.integers(0, 3, (4000, 2)).astype(float), rng.integers(0, 3, 4000)
+    x_test = rng.integers(0, 3, (2000, 2)).astype(float)
+    knn = KNN(K=5, dist_fn=dist_fn, memory_budget=10**6).fit(x, y)
+    previous = models._backend
+    models.set_backend('numpy')
+    try:
+        tracemalloc.start()
+        knn.predict(x_test)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        models.set_backend(previous)
+    assert peak <= knn.memory_budget
+
+def test_recall_counts_ties(rng, monkeypatch):
+    #100 copies of the test sample, the brute-force search keeps the first 5 and an index may return any 5 of them
+    x = np.concatenate((np.zeros((100, 2)), rng.uniform(1, 2, (100, 2))))
+    knn = KNN(K=5).fit(x, np.zeros(200, dtype=int))
+    monkeypatch.setattr(knn, 'predict', lambda x_test: (None, np.arange(95, 100)[None,:]))
+    assert knn.recall_at_k(np.zeros((1, 2))) == 1
+    monkeypatch.setattr(knn, 'predict', lambda x_test: (None, np.array([[0, 1, 2, 3, 150]])))
+    assert knn.recall_at_k(np.zeros((1, 2))) == 0.8
+
+@pytest.mark.parametrize('index', ['kd_tree', 'ball_tree', 'rp_forest'])
+def test_index_distance_evaluations(rng, index):
+    x, y = rng.normal(size=(2000, 2)), rng.integers(0, 3, 2000)
+    x_test = rng.normal(size=(50, 2))
+    profiler = models.Profiler()
+    KNN(K=5, index=index, seed=0, stats=profiler).fit(x, y).predict(x_test)
+    #the index compares every test sample to a few leaves instead of the whole training set
+    assert 5 * 50 <= profiler.counters['knn.distance_evaluations'] < 2000 * 50 / 4
@@ -0,0 +1,27 @@
+"""The experiment runner gives the same results in the calling process and in worker processes."""
+
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from models import KNN, DecisionTree, run_experiments
+
+@pytest.fixture
+def dataset():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({'a': rng.normal(size=200), 'b': rng.normal(size=200), 'label': rng.integers(0, 2, 200)})
+
+configs = {'knn': (KNN, {'K': 3, 'index': 'rp_forest'}), 'tree': (DecisionTree, {'max_depth': 4})}
+
+def test_serial_by_default(dataset, monkeypatch):
+    #without n_jobs no worker process is started
+    monkeypatch.setattr(multiprocessing, 'get_context', lambda *args: pytest.fail('started a worker pool'))
+    results = run_experiments(dataset, ['a', 'b'], 'label', configs, 3, 150, seed=1)
+    assert len(results) == 6
+
+def test_workers_match_serial(dataset):
+    serial = run_experiments(dataset, ['a', 'b'], 'label', configs, 3, 150, seed=1)
+    parallel = run_experiments(dataset, ['a', 'b'], 'label', configs, 3, 150, n_jobs=2, seed=1)
+    pd.testing.assert_frame_equal(serial, parallel)
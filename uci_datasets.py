@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""Loaders for the UCI datasets used in the experiments.
+
+A dataset is downloaded and cleaned only once: the cleaned columns are saved as .npy files in a local cache, in a directory
+named after the sha256 checksum of the downloaded file, and later runs load them back without any network access. The cache
+directory defaults to a data directory next to this file and can be moved with the DATASET_CACHE environment variable.
+A raw file already on disk can be given as source to fill the cache on a machine without network access.
+"""
+
+import hashlib
+import io
+import json
+import os
+import urllib.request
+
+import numpy as np
+import pandas as pd
+
+CACHE_DIR = os.environ.get('DATASET_CACHE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+
+DATASETS = {
+    'hepatitis': {
+        'url': "http://archive.ics.uci.edu/ml/machine-learning-databases/hepatitis/hepatitis.data",
+        'names': ["CLASS", "AGE", "SEX", "STEROID", "ANTIVIRALS", "FATIGUE", "MALAISE", "ANOREXIA",
+                  "LIVER BIG", "LIVER FIRM", "SPLEEN PALPABLE", "SPIDERS", "ASCITES", "VARICES",
+                  "BILIRUBIN", "ALK PHOSPHATE", "SGOT", "ALBUMIN", "PROTIME", "HISTOLOGY"],
+        'skiprows': 0,
+        'labels': None,
+    },
+    'diabetic': {
+        'url': "https://archive.ics.uci.edu/ml/machine-learning-databases/00329/messidor_features.arff",
+        'names': ["QUALITY ASSESSMENTS", "PRE-SCREENING", "MA DETECTION1", "MA DETECTION2", "MA DETECTION3", "MA DETECTION4",
+                  "MA DETECTION5", "MA DETECTION6", "EXUDATE DETECTION1", "EXUDATE DETECTION2", "EXUDATE DETECTION3",
+                  "EXUDATE DETECTION4", "EXUDATE DETECTION5", "EXUDATE DETECTION6", "EXUDATE DETECTION7", "EXUDATE DETECTION8",
+                  "EUCLIEAN DISTANCE", "DIAMETER", "AM/FM CLASSIFICATION", "CLASS LABEL"],
+        #skip the arff header
+        'skiprows': 24,
+        #replace 0 and 1 by 1 and 2 for consistency with the hepatitis dataset
+        'labels': ("CLASS LABEL", {0: 1, 1: 2}),
+    },
+}
+
+def clean(raw, names, skiprows=0, labels=None):
+    ''' Parses the raw bytes of a dataset, removes the rows containing unknown values and converts every column to numbers'''
+    #every field is read as a string so the unknown values are found with a single comparison over the whole table
+    data = pd.read_csv(io.BytesIO(raw), names=names, skiprows=skiprows, dtype=str)
+    data = data[(data != '?').all(axis=1)]
+    #each column is converted once, to integers when all its values are integers and to floats otherwise
+    data = data.apply(pd.to_numeric)
+    if labels is not None:
+        column, mapping = labels
+        data[column] = data[column].replace(mapping)
+    for col in data.columns:
+        if data[col].dtype.kind not in 'iuf':
+            raise ValueError(f'column {col} is not numeric after cleaning')
+        if data[col].isna().any():
+            raise ValueError(f'column {col} has missing values after cleaning')
+    return data
+
+def _save(data, directory, meta):
+    os.makedirs(directory, exist_ok=True)
+    np.save(os.path.join(directory, 'index.npy'), data.index.to_numpy())
+    for i, col in enumerate(data.columns):
+        np.save(os.path.join(directory, f'{i}.npy'), data[col].to_numpy())
+    meta = dict(meta, columns=list(data.columns), dtypes=[data[col].dtype.str for col in data.columns], num_rows=len(data))
+    #the metadata is written last, a directory without it is an interrupted save and is ignored
+    with open(os.path.join(directory, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=1)
+
+def _load(directory):
+    ''' Loads a cleaned dataset from its cache directory, or returns None if it is missing or does not match its metadata'''
+    try:
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        index = np.load(os.path.join(directory, 'index.npy'))
+        columns = {col: np.load(os.path.join(directory, f'{i}.npy')) for i, col in enumerate(meta['columns'])}
+    except (OSError, ValueError, KeyError):
+        return None
+    if index.shape[0] != meta['num_rows'] or any(columns[col].shape != index.shape or columns[col].dtype.str != dtype
+                                                 for col, dtype in zip(meta['columns'], meta['dtypes'])):
+        return None
+    return pd.DataFrame(columns, index=index)
+
+def load_dataset(name, source=None, cache_dir=None, refresh=False):
+    ''' Returns the cleaned dataset as a DataFrame. The cached copy is used when there is one, otherwise the raw file is read
+    from source (a local path or url, the UCI url by default), cleaned and cached under its checksum. refresh=True downloads
+    the source again and only cleans it again if its checksum changed'''
+    if name not in DATASETS:
+        raise ValueError(f'unknown dataset {name}, expected one of {list(DATASETS)}')
+    spec = DATASETS[name]
+    cache_dir = CACHE_DIR if cache_dir is None else cache_dir
+    #the pointer file names the checksum of the last source cached for this dataset
+    pointer = os.path.join(cache_dir, f'{name}.json')
+    if not refresh and source is None and os.path.exists(pointer):
+        with open(pointer) as f:
+            checksum = json.load(f)['sha256']
+        data = _load(os.path.join(cache_dir, f'{name}-{checksum}'))
+        if data is not None:
+            return data
+    source = spec['url'] if source is None else source
+    if os.path.exists(source):
+        with open(source, 'rb') as f:
+            raw = f.read()
+    else:
+        with urllib.request.urlopen(source) as response:
+            raw = response.read()
+    checksum = hashlib.sha256(raw).hexdigest()
+    directory = os.path.join(cache_dir, f'{name}-{checksum}')
+    data = _load(directory)
+    if data is None:
+        data = clean(raw, spec['names'], spec['skiprows'], spec['labels'])
+        _save(data, directory, {'name': name, 'source': source, 'sha256': checksum})
+    with open(pointer, 'w') as f:
+        json.dump({'sha256': checksum}, f)
+    return data